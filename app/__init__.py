@@ -11,23 +11,88 @@ def create_app():
     app = Flask(__name__, template_folder='../templates', static_folder='../static')
     app.config['SECRET_KEY'] = 'your-super-secret-key-that-is-long-and-random'
     project_dir = os.path.dirname(os.path.abspath(os.path.dirname(__file__)))
-    app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:///" + os.path.join(project_dir, "database.db")
+    from .database import database_uri, engine_options
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri(os.environ.get('DATABASE_URL'),
+                                                         "sqlite:///" + os.path.join(project_dir, "database.db"))
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'],
+                                                             int(os.environ.get('DB_POOL_SIZE', 10)),
+                                                             int(os.environ.get('DB_MAX_OVERFLOW', 20)))
+    app.config['CATALOG_SEED'] = os.environ.get('CATALOG_SEED', os.path.join(project_dir, 'data', 'recipes.json'))
+    app.config['CATALOG_SNAPSHOT'] = os.environ.get('CATALOG_SNAPSHOT', os.path.join(project_dir, 'instance', 'catalog'))
+    app.config['TOKEN_CACHE_SIZE'] = int(os.environ.get('TOKEN_CACHE_SIZE', 10000))
+    app.config['TOKEN_CACHE_TTL'] = int(os.environ.get('TOKEN_CACHE_TTL', 300))
+    app.config['BCRYPT_LOG_ROUNDS'] = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    app.config['PASSWORD_HASH_MAX_PENDING'] = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 32))
+    app.config['SUGGESTIONS_NEIGHBORS'] = int(os.environ.get('SUGGESTIONS_NEIGHBORS', 50))
+    app.config['SUGGESTIONS_REFRESH_SECONDS'] = int(os.environ.get('SUGGESTIONS_REFRESH_SECONDS', 300))
+    app.config['TOP_RATED_TTL'] = int(os.environ.get('TOP_RATED_TTL', 60))
+    app.config['RECOGNITION_BACKEND'] = os.environ.get('RECOGNITION_BACKEND', 'clarifai')
+    app.config['CLARIFAI_PAT'] = os.environ.get('CLARIFAI_PAT', 'deb567833d0c44789a5b2b0840802b06')
+    app.config['RECOGNITION_WORKERS'] = int(os.environ.get('RECOGNITION_WORKERS', 4))
+    app.config['RECOGNITION_MAX_PENDING'] = int(os.environ.get('RECOGNITION_MAX_PENDING', 32))
+    app.config['RECOGNITION_CACHE_SIZE'] = int(os.environ.get('RECOGNITION_CACHE_SIZE', 1024))
+    # A recognition job still pending after this many seconds is reported as timed out
+    app.config['RECOGNITION_TIMEOUT'] = float(os.environ.get('RECOGNITION_TIMEOUT', 30))
+    app.config['RECOGNITION_MAX_UPLOAD'] = int(os.environ.get('RECOGNITION_MAX_UPLOAD', 10 * 1024 * 1024))
+    app.config['RECOGNITION_MAX_SIDE'] = int(os.environ.get('RECOGNITION_MAX_SIDE', 512))
+    app.config['RECOGNITION_JPEG_QUALITY'] = int(os.environ.get('RECOGNITION_JPEG_QUALITY', 85))
+    # Substitution chains longer than one edge are opt-in; chains weaker than the minimum are ignored
+    app.config['SUBSTITUTION_MAX_HOPS'] = int(os.environ.get('SUBSTITUTION_MAX_HOPS', 1))
+    app.config['SUBSTITUTION_MIN_CONFIDENCE'] = float(os.environ.get('SUBSTITUTION_MIN_CONFIDENCE', 0.3))
+    # /generate result cache: a per-process LRU, or Redis shared by all workers when a URL is given
+    app.config['RESULT_CACHE_SIZE'] = int(os.environ.get('RESULT_CACHE_SIZE', 1024))
+    app.config['RESULT_CACHE_URL'] = os.environ.get('RESULT_CACHE_URL')
+    app.config['RESULT_CACHE_TTL'] = int(os.environ.get('RESULT_CACHE_TTL', 300))
+    # /metrics (Prometheus text); with METRICS_TOKEN set it needs "Authorization: Bearer <token>"
+    app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '1') != '0'
+    app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+    # Sampling profiler for in-flight requests, off unless an interval is given (or toggled on /metrics/profile,
+    # which needs METRICS_TOKEN); intervals under 1ms are raised to 1ms
+    app.config['PROFILER_INTERVAL_MS'] = float(os.environ.get('PROFILER_INTERVAL_MS', 0))
+    # Startup: CATALOG_LOAD=lazy defers loading to the first request; DATABASE_INIT=cli leaves the
+    # schema to `flask database init`; WARMUP names the startup.WARMUPS hooks run once the catalog is loaded
+    app.config['CATALOG_LOAD'] = os.environ.get('CATALOG_LOAD', 'eager')
+    app.config['DATABASE_INIT'] = os.environ.get('DATABASE_INIT', 'startup')
+    app.config['WARMUP'] = [name.strip() for name in os.environ.get('WARMUP', 'scoring,autocomplete,results').split(',')
+                            if name.strip()]
+    # Bodies beyond this are refused while being received, before any route sees them
+    app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))
 
     CORS(app)
     bcrypt.init_app(app)
 
     db.init_app(app)
 
-    with app.app_context():
-        from .models import init_data
-        db.create_all()
-        init_data()
+    from .utils import token_cache
+    from . import passwords, ratings, recognition, models, metrics, results
+    token_cache.configure(app.config['TOKEN_CACHE_SIZE'], app.config['TOKEN_CACHE_TTL'])
+    passwords.configure(app.config['BCRYPT_LOG_ROUNDS'], app.config['PASSWORD_HASH_WORKERS'],
+                        app.config['PASSWORD_HASH_MAX_PENDING'])
+    ratings.configure(app.config['TOP_RATED_TTL'])
+    models.configure_substitutions(app.config['SUBSTITUTION_MAX_HOPS'], app.config['SUBSTITUTION_MIN_CONFIDENCE'])
+    results.configure(app.config['RESULT_CACHE_SIZE'], app.config['RESULT_CACHE_URL'], app.config['RESULT_CACHE_TTL'])
+    # With a Redis result cache, recognition jobs are kept there too, so any worker can answer a poll
+    shared = results.cache.backend if results.cache.backend.name == 'redis' else None
+    recognition.configure(app.config['RECOGNITION_BACKEND'], app.config['CLARIFAI_PAT'],
+                          app.config['RECOGNITION_WORKERS'], app.config['RECOGNITION_MAX_PENDING'],
+                          app.config['RECOGNITION_CACHE_SIZE'], max_side=app.config['RECOGNITION_MAX_SIDE'],
+                          quality=app.config['RECOGNITION_JPEG_QUALITY'], shared=shared)
+    metrics.init_app(app)
+
+    from . import startup
+    startup.init_app(app)
 
     from .auth import auth_bp
     from .recipes import recipes_bp
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(recipes_bp, url_prefix='/api')
 
+    from .catalog import catalog_cli
+    app.cli.add_command(catalog_cli)
+    from .database import database_cli
+    app.cli.add_command(database_cli)
+
     @app.route('/')
     def landing_page():
         return render_template('landing.html')
@@ -2,7 +2,7 @@ from flask import Blueprint, request, jsonify, current_app
 # UPDATED: Corrected the import statement for PyJWT
 import jwt
 import datetime
-from .extensions import bcrypt
+from . import passwords
 from .models import UserProfile
 from . import db
 
@@ -14,11 +14,14 @@ def register():
     if UserProfile.query.filter_by(email=data['email']).first():
         return jsonify({'message': 'User with this email already exists'}), 409
 
-    new_user = UserProfile(
-        name=data['name'],
-        email=data['email'],
-        password=data['password']
-    )
+    try:
+        new_user = UserProfile(
+            name=data['name'],
+            email=data['email'],
+            password=data['password']
+        )
+    except passwords.HashingBusy:
+        return jsonify({'message': 'Server is busy, please try again shortly'}), 503
     db.session.add(new_user)
     db.session.commit()
     return jsonify({'message': 'New user registered successfully!'}), 201
@@ -28,13 +31,23 @@ def login():
     auth = request.get_json()
     user = UserProfile.query.filter_by(email=auth['email']).first()
 
-    if not user or not bcrypt.check_password_hash(user.password_hash, auth['password']):
-        return jsonify({'message': 'Invalid credentials'}), 401
+    try:
+        if not user or not passwords.check_password(user.password_hash, auth['password']):
+            return jsonify({'message': 'Invalid credentials'}), 401
+
+        # Bring hashes made under an older cost factor up to the configured one
+        if passwords.needs_rehash(user.password_hash):
+            user.password_hash = passwords.hash_password(auth['password'])
+            db.session.commit()
+    except passwords.HashingBusy:
+        return jsonify({'message': 'Server is busy, please try again shortly'}), 503
 
     # This line now uses the correctly imported module
     token = jwt.encode({
+        'user_id': user.id,
         'name': user.name,
         'email': user.email,
+        'pwd': passwords.fingerprint(user.password_hash),
         'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=24)
     }, current_app.config['SECRET_KEY'], algorithm="HS256")
 
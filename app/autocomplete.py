@@ -0,0 +1,116 @@
+from bisect import bisect_left
+import numpy as np
+from . import models
+from .canonical import canonical_name
+from .scoring import get_engine
+
+# Prefix ranges bigger than this (one- or two-letter queries) have their top completions memoized
+LARGE_RANGE = 256
+MEMO_SIZE = 50
+MIN_SIMILARITY = 0.3
+
+def normalize(text):
+    return ' '.join(text.lower().split())
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class IngredientIndex:
+    """Ranked ingredient completions: prefix matches first, then typo-tolerant trigram matches.
+
+    The prefix side is a flattened trie: every word-start suffix of every ingredient
+    ("olive oil", "oil") in one sorted list, so a prefix is a binary search for its range.
+    Within a range, whole-name matches beat later-word matches, then more common
+    ingredients (used by more recipes) win. Trigram postings catch misspellings.
+    """
+
+    def __init__(self, terms, popularity, version=None):
+        self.version = version
+        self.terms = list(terms)
+        n = len(self.terms)
+        order = sorted(range(n), key=lambda t: (-popularity[t], len(self.terms[t]), self.terms[t]))
+        self.rank = np.empty(n, dtype=np.int64)
+        self.rank[order] = np.arange(n)
+
+        keys = []
+        for term_id, term in enumerate(self.terms):
+            for i in range(len(term)):
+                if i == 0 or term[i - 1] == ' ':
+                    keys.append((term[i:], i == 0, term_id))
+        keys.sort()
+        self._keys = [key for key, _, _ in keys]
+        self._key_terms = np.asarray([term_id for _, _, term_id in keys], dtype=np.int64)
+        # Later-word matches sort after every whole-name match
+        self._key_scores = self.rank[self._key_terms] + np.asarray([0 if start else n for _, start, _ in keys],
+                                                                   dtype=np.int64)
+
+        postings = {}
+        self._gram_counts = np.zeros(n, dtype=np.int64)
+        for term_id, term in enumerate(self.terms):
+            grams = trigrams(term)
+            self._gram_counts[term_id] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(term_id)
+        self._postings = {gram: np.asarray(ids, dtype=np.int64) for gram, ids in postings.items()}
+        self._memo = {}
+
+    def prefix(self, query, limit):
+        lo = bisect_left(self._keys, query)
+        hi = bisect_left(self._keys, query + '\uffff', lo)
+        large = hi - lo > LARGE_RANGE
+        if large:
+            if query in self._memo and len(self._memo[query]) >= limit:
+                return self._memo[query][:limit]
+            limit = max(limit, MEMO_SIZE)
+
+        scores, ids = self._key_scores[lo:hi], self._key_terms[lo:hi]
+        if large:
+            # A term appears at most once per word, so a few times `limit` candidates is plenty
+            keep = min(len(scores), limit * 4)
+            top = np.argpartition(scores, keep - 1)[:keep]
+            scores, ids = scores[top], ids[top]
+        ids = ids[np.argsort(scores, kind='stable')]
+        _, first = np.unique(ids, return_index=True)
+        result = ids[np.sort(first)][:limit].tolist()
+        if large:
+            self._memo[query] = result
+        return result[:limit]
+
+    def fuzzy(self, query, limit, exclude=()):
+        query_grams = trigrams(query)
+        grams = [self._postings[g] for g in query_grams if g in self._postings]
+        if not grams:
+            return []
+        counts = np.bincount(np.concatenate(grams), minlength=len(self.terms))
+        # Jaccard similarity can only reach MIN_SIMILARITY with this many shared trigrams
+        ids = np.flatnonzero(counts >= max(1, int(np.ceil(MIN_SIMILARITY * len(query_grams)))))
+        shared = counts[ids]
+        similarity = shared / (len(query_grams) + self._gram_counts[ids] - shared)
+        keep = similarity >= MIN_SIMILARITY
+        ids, similarity = ids[keep], similarity[keep]
+        order = np.lexsort((self.rank[ids], -similarity))
+        excluded = set(exclude)
+        return [t for t in ids[order][:limit + len(excluded)].tolist() if t not in excluded][:limit]
+
+    def complete(self, text, limit=10):
+        query = normalize(text)
+        if not query:
+            return []
+        found = self.prefix(query, limit)
+        if len(found) < limit and len(query) >= 3:
+            found += self.fuzzy(query, limit - len(found), exclude=found)
+        return [self.terms[t] for t in found]
+
+_index = None
+
+def get_index():
+    global _index
+    if _index is None or _index.version != models.catalog_version:
+        engine = get_engine()
+        recipe_counts = np.diff(engine.postings_ptr)
+        # The engine's vocabulary is keyed by canonical name ("tomatoes" -> "tomato")
+        term_ids = (engine.vocab.get(canonical_name(term)) for term in models.all_ingredients)
+        popularity = [int(recipe_counts[term_id]) if term_id is not None else 0 for term_id in term_ids]
+        _index = IngredientIndex(models.all_ingredients, popularity, models.catalog_version)
+    return _index
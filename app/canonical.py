@@ -0,0 +1,65 @@
+from functools import lru_cache
+import hashlib
+import json
+
+# Ingredient names are compared in canonical form: lowercased, whitespace collapsed, the
+# last word singularized ("cherry tomatoes" -> "cherry tomato") and known aliases mapped
+# to one name. The form only has to be consistent on both sides of a comparison, so the
+# singular rules are deliberately simple; words they would mangle are listed as invariant.
+RULES_VERSION = 2
+
+ALIASES = {
+    "scallion": "green onion",
+    "spring onion": "green onion",
+    "minced beef": "ground beef",
+    "beef mince": "ground beef",
+    "hamburger meat": "ground beef",
+    "prawn": "shrimp",
+    "courgette": "zucchini",
+    "aubergine": "eggplant",
+    "capsicum": "bell pepper",
+    "sweet pepper": "bell pepper",
+    "garbanzo bean": "chickpea",
+    "coriander leaf": "cilantro",
+    "cheddar": "cheddar cheese",
+    "parmesan cheese": "parmesan",
+    "parmigiano reggiano": "parmesan",
+    "mozzarella cheese": "mozzarella",
+    "plain flour": "all-purpose flour",
+    "all purpose flour": "all-purpose flour",
+    "extra virgin olive oil": "olive oil",
+    "bean curd": "tofu",
+    "soya sauce": "soy sauce",
+    "yoghurt": "yogurt",
+    "chicken breast": "chicken",
+    "chicken thigh": "chicken",
+    "vegetable stock": "vegetable broth"
+}
+
+IRREGULAR = {"leaves": "leaf", "halves": "half", "loaves": "loaf", "knives": "knife"}
+INVARIANT = {"asparagus", "couscous", "hummus", "molasses", "swiss", "grits", "citrus", "series", "species"}
+
+def singular(word):
+    if word in IRREGULAR:
+        return IRREGULAR[word]
+    if word in INVARIANT or len(word) <= 3 or not word.endswith('s') or word.endswith(('ss', 'us', 'is')):
+        return word
+    if word.endswith('ies'):
+        return word[:-3] + 'y'
+    if word.endswith(('oes', 'ches', 'shes', 'xes', 'sses')):
+        return word[:-2]
+    return word[:-1]
+
+@lru_cache(maxsize=65536)
+def canonical_name(name):
+    words = name.lower().split()
+    if not words:
+        return ''
+    words[-1] = singular(words[-1])
+    text = ' '.join(words)
+    return ALIASES.get(text, text)
+
+def rules_digest():
+    """Fingerprint of the naming rules, for indexes built over canonical names."""
+    rules = {'version': RULES_VERSION, 'aliases': ALIASES, 'irregular': IRREGULAR, 'invariant': sorted(INVARIANT)}
+    return hashlib.sha256(json.dumps(rules, sort_keys=True).encode('utf-8')).hexdigest()
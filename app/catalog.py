@@ -0,0 +1,332 @@
+import csv
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import click
+import numpy as np
+from flask import current_app
+from flask.cli import AppGroup
+from .canonical import rules_digest
+
+# On-disk catalog snapshot, one directory:
+#   meta.json           names (row order), ingredient list, engine metadata, provenance, content digest
+#   records.bin         each recipe's core fields as a UTF-8 JSON record, back to back
+#   offsets.npy         int64 byte offsets into records.bin (n + 1 entries)
+#   details.bin         each recipe's DETAIL_FIELDS (steps, nutrition, reviews), same layout
+#   detail_offsets.npy  int64 byte offsets into details.bin
+#   engine/*.npy        the scoring engine's prebuilt arrays
+# Workers memory-map the arrays and both blobs, so opening a snapshot costs the same
+# whatever the catalog size, and the pages are shared between worker processes. A recipe
+# is only decoded the first time it is looked up, and its details only when asked for.
+# Format 1 snapshots had no details blob (records.bin held whole records); they still load.
+# Format 3 added quantities and servings to the engine arrays; older snapshots
+# still load, but their engine is compiled in memory.
+FORMAT_VERSION = 3
+READABLE_FORMATS = (1, 2, 3)
+
+RECORD_FIELDS = ('name', 'ingredients', 'steps', 'nutrition', 'difficulty', 'cook_time',
+                 'cuisine', 'image_url', 'reviews', 'tags', 'servings')
+DETAIL_FIELDS = ('steps', 'nutrition', 'reviews')
+
+def _number(value):
+    number = float(value)
+    return int(number) if number.is_integer() else number
+
+def _pairs(text):
+    # "pasta:200;egg:2" -> {"pasta": "200", "egg": "2"}; _validate turns the values into numbers
+    pairs = {}
+    for item in filter(None, (part.strip() for part in text.split(';'))):
+        key, _, value = item.rpartition(':')
+        pairs[key.strip()] = value.strip()
+    return pairs
+
+def _csv_record(row):
+    # Cells may hold JSON, or the compact forms: "a:1;b:2" for mappings, "|" between steps, ";" between tags
+    def cell(name, parse):
+        text = (row.get(name) or '').strip()
+        return json.loads(text) if text[:1] in ('[', '{') else parse(text)
+
+    return {
+        'name': (row.get('name') or '').strip(),
+        'ingredients': cell('ingredients', _pairs),
+        'steps': cell('steps', lambda t: [s.strip() for s in t.split('|') if s.strip()]),
+        'nutrition': cell('nutrition', _pairs),
+        'difficulty': (row.get('difficulty') or '').strip(),
+        'cook_time': row.get('cook_time'),
+        'cuisine': (row.get('cuisine') or '').strip(),
+        'image_url': (row.get('image_url') or '').strip(),
+        'reviews': [],
+        'tags': cell('tags', lambda t: [s.strip() for s in t.split(';') if s.strip()]),
+        'servings': row.get('servings') or 1
+    }
+
+def _numbers(values, field):
+    # Quantities and nutrition end up in float arrays, so every value must be a plain number
+    if not isinstance(values, dict):
+        raise ValueError(f"{field} must be a mapping of name to number")
+    numbers = {}
+    for key, value in values.items():
+        try:
+            if isinstance(value, bool):
+                raise TypeError()
+            numbers[str(key)] = _number(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{field}[{key!r}] must be a number, got {value!r}") from None
+    return numbers
+
+def _validate(record, where):
+    if not isinstance(record, dict) or not str(record.get('name') or '').strip():
+        raise ValueError(f"{where}: recipe needs a name")
+    where = f"{where} ({str(record['name']).strip()})"
+    if not isinstance(record.get('ingredients'), dict):
+        raise ValueError(f"{where}: ingredients must be a mapping of ingredient to quantity")
+    try:
+        return {
+            'name': str(record['name']).strip(),
+            'ingredients': _numbers(record['ingredients'], 'ingredients'),
+            'steps': [str(s) for s in record.get('steps') or []],
+            'nutrition': _numbers(record.get('nutrition') or {}, 'nutrition'),
+            'difficulty': str(record.get('difficulty') or ''),
+            'cook_time': int(record.get('cook_time') or 0),
+            'cuisine': str(record.get('cuisine') or ''),
+            'image_url': str(record.get('image_url') or ''),
+            'reviews': list(record.get('reviews') or []),
+            'tags': [str(t) for t in record.get('tags') or []],
+            'servings': int(record.get('servings') or 1)
+        }
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"{where}: {e}") from e
+
+def read_recipe_dump(path):
+    """Reads a JSON (list of recipe objects) or CSV recipe dump into validated records."""
+    if path.lower().endswith('.csv'):
+        with open(path, newline='', encoding='utf-8') as f:
+            rows = [_csv_record(row) for row in csv.DictReader(f)]
+        offset = 2  # header is line 1
+    else:
+        with open(path, encoding='utf-8') as f:
+            rows = json.load(f)
+        if isinstance(rows, dict):
+            rows = rows.get('recipes', [])
+        offset = 0
+    return [_validate(row, f"{path}:{i + offset}") for i, row in enumerate(rows)]
+
+def file_digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def directory_digest(path):
+    """sha256 over every file under `path` (relative names and contents), in a fixed order."""
+    digest = hashlib.sha256()
+    for directory, subdirs, files in sorted(os.walk(path)):
+        subdirs.sort()
+        for name in sorted(files):
+            digest.update(os.path.relpath(os.path.join(directory, name), path).encode('utf-8') + b'\0')
+            with open(os.path.join(directory, name), 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(chunk)
+    return digest.hexdigest()
+
+def _write_blob(directory, blob_name, offsets_name, records):
+    offsets = [0]
+    with open(os.path.join(directory, blob_name), 'wb') as f:
+        for record in records:
+            encoded = json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            f.write(encoded)
+            offsets.append(offsets[-1] + len(encoded))
+    np.save(os.path.join(directory, offsets_name), np.asarray(offsets, dtype=np.int64))
+
+def _map_blob(path):
+    with open(path, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b''
+
+def write_snapshot(path, records, ingredients, engine_arrays, engine_meta, source=None, replace=True):
+    """Writes a snapshot next to `path` and swaps it in. Returns False if replace=False and one already exists."""
+    tmp = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(os.path.join(tmp, 'engine'))
+
+    _write_blob(tmp, 'records.bin', 'offsets.npy',
+                ({k: v for k, v in r.items() if k not in DETAIL_FIELDS} for r in records))
+    _write_blob(tmp, 'details.bin', 'detail_offsets.npy',
+                ({k: r[k] for k in DETAIL_FIELDS} for r in records))
+    for name, array in engine_arrays.items():
+        np.save(os.path.join(tmp, 'engine', f"{name}.npy"), np.ascontiguousarray(array))
+
+    meta = {
+        'format': FORMAT_VERSION,
+        'names': [r['name'] for r in records],
+        'ingredients': ingredients,
+        'engine': engine_meta,
+        # The engine arrays are only valid for the naming rules (aliases, plurals) they were built with
+        'rules_digest': rules_digest(),
+        'source': source
+    }
+    # Hashed once here, from the files just written plus the rest of the metadata, so readers
+    # can tell snapshots apart without reading them
+    digest = hashlib.sha256(directory_digest(tmp).encode('ascii'))
+    digest.update(json.dumps(meta, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+    meta['digest'] = digest.hexdigest()
+    with open(os.path.join(tmp, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if os.path.exists(path):
+        if not replace:
+            shutil.rmtree(tmp)
+            return False
+        # Workers that still map the old files keep valid mappings after the unlink
+        old = f"{path}.old-{os.getpid()}"
+        os.rename(path, old)
+        os.rename(tmp, path)
+        shutil.rmtree(old, ignore_errors=True)
+        return True
+    try:
+        os.rename(tmp, path)
+    except OSError:
+        # Another worker published its snapshot first
+        if not os.path.isdir(path):
+            raise
+        shutil.rmtree(tmp, ignore_errors=True)
+        return False
+    return True
+
+class CatalogSnapshot:
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        if self.meta.get('format') not in READABLE_FORMATS:
+            raise ValueError(f"{path}: unsupported catalog snapshot format {self.meta.get('format')}")
+        self.names = self.meta['names']
+        self.ingredients = self.meta['ingredients']
+        self.offsets = np.load(os.path.join(path, 'offsets.npy'), mmap_mode='r')
+        self._blob = _map_blob(os.path.join(path, 'records.bin'))
+        if self.meta['format'] == 1:
+            self.detail_offsets, self._details_blob = self.offsets, self._blob
+        else:
+            self.detail_offsets = np.load(os.path.join(path, 'detail_offsets.npy'), mmap_mode='r')
+            self._details_blob = _map_blob(os.path.join(path, 'details.bin'))
+
+    @property
+    def digest(self):
+        """Content digest of the snapshot; snapshots written before it was recorded are hashed on first use."""
+        if 'digest' not in self.meta:
+            self.meta['digest'] = directory_digest(self.path)
+        return self.meta['digest']
+
+    def record(self, row):
+        return json.loads(self._blob[self.offsets[row]:self.offsets[row + 1]])
+
+    def details(self, row):
+        record = json.loads(self._details_blob[self.detail_offsets[row]:self.detail_offsets[row + 1]])
+        return {k: record[k] for k in DETAIL_FIELDS}
+
+    def engine_matches(self):
+        return self.meta.get('format') == FORMAT_VERSION and self.meta.get('rules_digest') == rules_digest()
+
+    def engine_arrays(self):
+        engine_dir = os.path.join(self.path, 'engine')
+        arrays = {name[:-len('.npy')]: np.load(os.path.join(engine_dir, name), mmap_mode='r')
+                  for name in os.listdir(engine_dir) if name.endswith('.npy')}
+        return arrays, self.meta['engine']
+
+class RecipeStore:
+    """Ordered name -> Recipe mapping, optionally backed by a snapshot and decoded on first access."""
+
+    def __init__(self, decode):
+        self._decode = decode
+        self.clear()
+
+    def clear(self):
+        self.snapshot = None
+        self.modified = False
+        self._names = []
+        self._rows = {}
+        self._recipes = {}
+
+    def attach(self, snapshot):
+        self.clear()
+        self.snapshot = snapshot
+        self._names = list(snapshot.names)
+        self._rows = {name: row for row, name in enumerate(self._names)}
+
+    @property
+    def pristine_snapshot(self):
+        # The snapshot's prebuilt indexes only describe the store until something is added
+        return None if self.modified else self.snapshot
+
+    def row(self, name):
+        return self._rows.get(name)
+
+    def by_row(self, row):
+        recipe = self._recipes.get(row)
+        if recipe is None:
+            recipe = self._recipes[row] = self._decode(self.snapshot, row)
+        return recipe
+
+    def __setitem__(self, name, recipe):
+        row = self._rows.get(name)
+        if row is None:
+            row = self._rows[name] = len(self._names)
+            self._names.append(name)
+        self._recipes[row] = recipe
+        self.modified = True
+
+    def __getitem__(self, name):
+        return self.by_row(self._rows[name])
+
+    def get(self, name, default=None):
+        row = self._rows.get(name)
+        return default if row is None else self.by_row(row)
+
+    def __contains__(self, name):
+        return name in self._rows
+
+    def __len__(self):
+        return len(self._names)
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def keys(self):
+        return list(self._names)
+
+    def values(self):
+        return (self.by_row(row) for row in range(len(self._names)))
+
+    def items(self):
+        return ((name, self.by_row(row)) for row, name in enumerate(self._names))
+
+catalog_cli = AppGroup('catalog', help='Build or import the on-disk recipe catalog.')
+
+@catalog_cli.command('import')
+@click.argument('paths', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+def import_command(paths):
+    """Replace the catalog with the recipes in one or more JSON/CSV dumps (later dumps win)."""
+    from .models import build_catalog
+    records = {}
+    for path in paths:
+        try:
+            dump = read_recipe_dump(path)
+        except ValueError as e:
+            raise click.ClickException(str(e)) from e
+        for record in dump:
+            records[record['name']] = record
+    snapshot_path = current_app.config['CATALOG_SNAPSHOT']
+    # Marked as imported so startup never mistakes it for a seed build, whatever the paths
+    source = {'paths': [os.path.abspath(path) for path in paths], 'imported': True}
+    build_catalog(list(records.values()), snapshot_path, source=source)
+    click.echo(f"Imported {len(records)} recipes into {snapshot_path}")
+
+@catalog_cli.command('build')
+def build_command():
+    """Rebuild the catalog snapshot from the seed dump."""
+    from .models import build_catalog
+    seed_path = current_app.config['CATALOG_SEED']
+    records = read_recipe_dump(seed_path)
+    build_catalog(records, current_app.config['CATALOG_SNAPSHOT'],
+                  source={'path': os.path.abspath(seed_path), 'sha256': file_digest(seed_path)})
+    click.echo(f"Built {len(records)} recipes into {current_app.config['CATALOG_SNAPSHOT']}")
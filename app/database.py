@@ -0,0 +1,62 @@
+import sqlite3
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import event, inspect
+from sqlalchemy.engine import Engine
+from .models import FavoriteRecipe, RecipeRating, db
+
+def database_uri(url, default):
+    if not url:
+        return default
+    # Heroku-style URLs use the scheme SQLAlchemy dropped in 1.4
+    return 'postgresql://' + url[len('postgres://'):] if url.startswith('postgres://') else url
+
+def engine_options(uri, pool_size=10, max_overflow=20):
+    if uri.startswith('sqlite'):
+        # Writers wait for the lock instead of failing with "database is locked"
+        return {'connect_args': {'timeout': 30}}
+    return {'pool_size': pool_size, 'max_overflow': max_overflow, 'pool_pre_ping': True, 'pool_recycle': 1800}
+
+@event.listens_for(Engine, 'connect')
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        # WAL lets readers proceed while a rating or favorite is being written
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.close()
+
+def upgrade():
+    """Brings the indexes of an existing database up to the current models.
+
+    db.create_all() only creates missing tables, so indexes added to existing ones are
+    created here. A no-op once up to date; returns the number of indexes created.
+    """
+    connection = db.session.connection()
+    inspector = inspect(connection)
+    created = 0
+    for model in (FavoriteRecipe, RecipeRating):
+        table = model.__table__
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(connection)
+                created += 1
+    db.session.commit()
+    return created
+
+database_cli = AppGroup('database', help='Manage the application database.')
+
+@database_cli.command('init')
+def init_command():
+    """Create missing tables, upgrade existing ones and backfill rating stats (run once per deploy with DATABASE_INIT=cli)."""
+    from . import startup
+    created = startup.init_database(current_app)
+    click.echo(f"Database ready: created {created} indexes")
+
+@database_cli.command('upgrade')
+def upgrade_command():
+    """Add missing indexes to an existing database."""
+    created = upgrade()
+    click.echo(f"Created {created} indexes")
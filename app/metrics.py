@@ -0,0 +1,296 @@
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+import os
+import sys
+import threading
+import time
+from flask import Blueprint, Response, current_app, g, has_request_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Process-local instrumentation: latency histograms per route and per named stage of a
+# request, DB query counts and durations, and a few plain counters, served in Prometheus
+# text format on /metrics. Each worker process keeps (and serves) its own numbers, the way
+# Prometheus expects a multi-process server to be scraped per worker or aggregated upstream.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000, 1000000)
+# Distinct stacks the profiler keeps; rarer ones are folded into one "(other)" entry
+MAX_STACKS = 10000
+# Shortest sampling interval (seconds); each sample walks every request thread's stack
+MIN_PROFILER_INTERVAL = 0.001
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class Registry:
+    def __init__(self):
+        self.enabled = True
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render(self, gauges=()):
+        """Prometheus text exposition of everything recorded, plus (name, labels, value) gauges."""
+        with self._lock:
+            histograms = [(key, h.buckets, list(h.counts), h.sum, h.count) for key, h in self._histograms.items()]
+            counters = list(self._counters.items())
+        lines = []
+        typed = set()
+
+        def declare(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), buckets, counts, total, count in sorted(histograms):
+            declare(name, 'histogram')
+            cumulative = 0
+            for bound, bucket_count in zip(buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {total!r}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+        for (name, labels), value in sorted(counters):
+            declare(name, 'counter')
+            lines.append(f"{name}{_labels(labels)} {value}")
+        for name, labels, value in gauges:
+            declare(name, 'gauge')
+            lines.append(f"{name}{_labels(tuple(sorted(labels.items())))} {value}")
+        return '\n'.join(lines) + '\n'
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+registry = Registry()
+
+def _route():
+    # Work done outside a request (startup, background refreshes) is labelled "background"
+    if not has_request_context():
+        return 'background'
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+@contextmanager
+def stage(name):
+    """Times a block of the current request as stage `name` of its route."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe('stage_duration_seconds', time.perf_counter() - start, route=_route(), stage=name)
+
+def observe_count(name, value, **labels):
+    registry.observe(name, value, buckets=COUNT_BUCKETS, route=_route(), **labels)
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_query(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_query(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('query_start')
+    if not starts:
+        return
+    registry.observe('db_query_duration_seconds', time.perf_counter() - starts.pop(), route=_route())
+    if has_request_context():
+        g.metrics_queries = g.get('metrics_queries', 0) + 1
+
+class SamplingProfiler:
+    """Samples the stacks of threads that are serving a request every `interval` seconds.
+
+    Stacks are kept as folded "frame;frame;frame count" lines, ready for flamegraph tools.
+    Started lazily per process, so forked workers each run their own sampler thread.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.interval = 0.01
+        self.samples = 0
+        self._stacks = Counter()
+        self._active = set()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self):
+        return self._pid == os.getpid() and not self._stop.is_set()
+
+    def configure(self, enabled, interval=None):
+        """Turns sampling on or off; the sampler thread itself starts with the next request."""
+        with self._lock:
+            self.enabled = enabled
+            if interval:
+                self.interval = max(interval, MIN_PROFILER_INTERVAL)
+            self._stop.set()
+
+    def ensure_running(self):
+        if not self.enabled or self.running:
+            return
+        with self._lock:
+            if self.enabled and not self.running:
+                self._stop = threading.Event()
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, args=(self._stop, self.interval),
+                                 name='sampling-profiler', daemon=True).start()
+
+    def enter(self):
+        self._active.add(threading.get_ident())
+
+    def leave(self):
+        self._active.discard(threading.get_ident())
+
+    def _run(self, stop, interval):
+        while not stop.wait(interval):
+            active = set(self._active)
+            if not active:
+                continue
+            frames = sys._current_frames()
+            with self._lock:
+                for ident in active:
+                    frame = frames.get(ident)
+                    if frame is None:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                        frame = frame.f_back
+                    key = ';'.join(reversed(stack))
+                    if key not in self._stacks and len(self._stacks) >= MAX_STACKS:
+                        key = '(other)'
+                    self._stacks[key] += 1
+                    self.samples += 1
+
+    def folded(self, reset=False):
+        with self._lock:
+            stacks = self._stacks.most_common()
+            if reset:
+                self._stacks.clear()
+                self.samples = 0
+        return ''.join(f"{stack} {count}\n" for stack, count in stacks)
+
+profiler = SamplingProfiler()
+
+def _before_request():
+    g.metrics_start = time.perf_counter()
+    g.metrics_queries = 0
+    profiler.ensure_running()
+    profiler.enter()
+
+def _after_request(response):
+    start = g.pop('metrics_start', None)
+    if start is not None:
+        route = _route()
+        registry.observe('http_request_duration_seconds', time.perf_counter() - start,
+                         method=request.method, route=route, status=response.status_code)
+        registry.observe('db_queries_per_request', g.get('metrics_queries', 0), buckets=COUNT_BUCKETS, route=route)
+    return response
+
+def _teardown_request(error=None):
+    profiler.leave()
+
+def init_app(app):
+    registry.enabled = app.config.get('METRICS_ENABLED', True)
+    if not registry.enabled:
+        return
+    interval = app.config.get('PROFILER_INTERVAL_MS', 0)
+    profiler.configure(interval > 0, interval / 1000)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.register_blueprint(metrics_bp)
+
+metrics_bp = Blueprint('metrics', __name__)
+
+def _authorized():
+    token = current_app.config.get('METRICS_TOKEN')
+    return not token or request.headers.get('Authorization') == f"Bearer {token}"
+
+def _gauges():
+    from . import models, results
+    from .recognition import recognizer
+    from .utils import token_cache
+    gauges = [('catalog_recipes', {}, len(models.recipe_store)),
+              ('catalog_version', {}, models.catalog_version),
+              ('profiler_samples', {}, profiler.samples)]
+    for cache, stats in (('token', token_cache.stats()), ('recognition', recognizer.stats()),
+                         ('generate', results.cache.stats())):
+        gauges += [('cache_hits', {'cache': cache}, stats['hits']),
+                   ('cache_misses', {'cache': cache}, stats['misses']),
+                   ('cache_hit_ratio', {'cache': cache}, stats['hit_ratio'])]
+        # Shared (Redis) caches don't report their size
+        entries = stats.get('size', stats.get('cached'))
+        if entries is not None:
+            gauges.append(('cache_entries', {'cache': cache}, entries))
+    gauges.append(('cache_errors', {'cache': 'generate'}, results.cache.stats()['errors']))
+    preprocessing = recognizer.stats()['preprocessing']
+    for stage_name, entry in preprocessing['stages'].items():
+        gauges += [('recognition_stage_calls', {'stage': stage_name}, entry['count']),
+                   ('recognition_stage_seconds', {'stage': stage_name}, entry['seconds']),
+                   ('recognition_stage_bytes_in', {'stage': stage_name}, entry['bytes_in']),
+                   ('recognition_stage_bytes_out', {'stage': stage_name}, entry['bytes_out'])]
+    gauges.append(('recognition_bytes_saved', {}, preprocessing['bytes_saved']))
+    return gauges
+
+@metrics_bp.route('/metrics')
+def metrics():
+    if not _authorized():
+        return jsonify({'message': 'Not authorized'}), 401
+    return Response(registry.render(_gauges()), mimetype='text/plain; version=0.0.4')
+
+@metrics_bp.route('/metrics/profile', methods=['GET', 'POST'])
+def profile():
+    """GET: folded stacks sampled so far (?reset=1 clears them). POST {"enabled", "interval_ms"}: toggle the sampler.
+
+    Stack dumps and sampler control are only served when METRICS_TOKEN is set.
+    """
+    if not current_app.config.get('METRICS_TOKEN'):
+        return jsonify({'message': 'Profiling needs METRICS_TOKEN to be set'}), 404
+    if not _authorized():
+        return jsonify({'message': 'Not authorized'}), 401
+    if request.method == 'GET':
+        return Response(profiler.folded(reset=request.args.get('reset') == '1'), mimetype='text/plain')
+    data = request.get_json(silent=True) or {}
+    interval = data.get('interval_ms', profiler.interval * 1000)
+    if isinstance(interval, bool) or not isinstance(interval, (int, float)) or interval <= 0:
+        return jsonify({'message': 'interval_ms must be a positive number'}), 400
+    profiler.configure(bool(data.get('enabled')), interval / 1000)
+    return jsonify({'enabled': profiler.enabled, 'interval_ms': profiler.interval * 1000})
@@ -0,0 +1,72 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import os
+import threading
+import hashlib
+import bcrypt
+
+# bcrypt runs in a small dedicated process pool so a burst of logins cannot occupy every
+# request thread. The pool is created lazily in each worker process (never inherited across
+# a fork) and admission is bounded: past max_pending queued jobs, callers get HashingBusy.
+# Pool processes are forked rather than spawned so they never re-import the entry script.
+_settings = {'rounds': 12, 'workers': 2, 'max_pending': 32}
+_state = {'pool': None, 'pid': None, 'slots': threading.BoundedSemaphore(32)}
+_lock = threading.Lock()
+
+class HashingBusy(Exception):
+    pass
+
+def configure(rounds=12, workers=2, max_pending=32):
+    with _lock:
+        if _state['pool'] is not None and _state['pid'] == os.getpid():
+            _state['pool'].shutdown(wait=False)
+        _settings.update(rounds=rounds, workers=workers, max_pending=max_pending)
+        _state.update(pool=None, pid=None, slots=threading.BoundedSemaphore(max_pending))
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+
+def _check(password_hash, password):
+    return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+
+def _pool():
+    with _lock:
+        if _state['pool'] is None or _state['pid'] != os.getpid():
+            _state['pool'] = ProcessPoolExecutor(
+                max_workers=_settings['workers'], mp_context=multiprocessing.get_context('fork'))
+            _state['pid'] = os.getpid()
+        return _state['pool']
+
+def _run(fn, *args):
+    if _settings['workers'] <= 0:
+        return fn(*args)
+    slots = _state['slots']
+    if not slots.acquire(blocking=False):
+        raise HashingBusy()
+    try:
+        return _pool().submit(fn, *args).result()
+    except BrokenProcessPool:
+        # Start a fresh pool on the next call instead of failing forever
+        with _lock:
+            _state['pool'] = None
+        raise
+    finally:
+        slots.release()
+
+def hash_password(password, rounds=None):
+    return _run(_hash, password, rounds or _settings['rounds'])
+
+def check_password(password_hash, password):
+    return _run(_check, password_hash, password)
+
+def hash_cost(password_hash):
+    # bcrypt hashes look like $2b$12$<salt+digest>
+    return int(password_hash.split('$')[2])
+
+def needs_rehash(password_hash):
+    return hash_cost(password_hash) != _settings['rounds']
+
+def fingerprint(password_hash):
+    # Carried in tokens so a new password (or rehash) invalidates every token issued before it
+    return hashlib.sha256(password_hash.encode('utf-8')).hexdigest()[:16]
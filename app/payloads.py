@@ -0,0 +1,123 @@
+import hashlib
+import json
+from flask import Response, request
+from . import models
+from .results import LocalBackend
+
+# Catalog-derived response bodies are encoded once per catalog version and reused as raw
+# JSON bytes. The encoding matches jsonify's defaults (sorted keys, compact separators)
+# so the responses are byte-for-byte what the endpoints produced before.
+_cache = {'version': None, 'prefixes': {}, 'documents': {}, 'details': None}
+# Recipe detail documents are kept for only this many recipes, least recently served dropped first
+DETAIL_CACHE_SIZE = 1024
+# Streamed lines are written in batches of about this many bytes rather than one write per recipe
+STREAM_CHUNK_SIZE = 32 * 1024
+
+def _dumps(obj):
+    return json.dumps(obj, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+def _current():
+    if _cache['version'] != models.catalog_version:
+        _cache.update(version=models.catalog_version, prefixes={}, documents={},
+                      details=LocalBackend(DETAIL_CACHE_SIZE))
+    return _cache
+
+def _summary_fields(recipe):
+    return {
+        "name": recipe.name,
+        "difficulty": recipe.difficulty,
+        "cook_time": recipe.cook_time,
+        "cuisine": recipe.cuisine,
+        "image_url": recipe.image_url
+    }
+
+def _prefix(recipe):
+    # "substitutions" sorts last, so everything before its value can be cached
+    prefixes = _current()['prefixes']
+    prefix = prefixes.get(recipe.name)
+    if prefix is None:
+        encoded = _dumps(dict(_summary_fields(recipe), substitutions={}))
+        prefix = prefixes[recipe.name] = encoded[:-len(b'{}}')]
+    return prefix
+
+def summary(recipe, substitutions=None, scaled=None):
+    if scaled:
+        # Scaled summaries carry per-request servings and ingredients, so they are encoded whole
+        return _dumps(dict(_summary_fields(recipe), substitutions=substitutions or {}, **scaled))
+    if not substitutions:
+        return _prefix(recipe) + b'{}}'
+    return _prefix(recipe) + _dumps(substitutions) + b'}'
+
+def recipes_response(fragments, **extra):
+    fields = {key: _dumps(value) for key, value in extra.items()}
+    fields['recipes'] = b'[' + b','.join(fragments) + b']'
+    body = b'{' + b','.join(_dumps(key) + b':' + fields[key] for key in sorted(fields)) + b'}\n'
+    return Response(body, mimetype='application/json')
+
+def _ndjson_chunks(fragments):
+    buffered, size = [], 0
+    for fragment in fragments:
+        buffered.append(fragment)
+        size += len(fragment) + 1
+        if size >= STREAM_CHUNK_SIZE:
+            yield b'\n'.join(buffered) + b'\n'
+            buffered, size = [], 0
+    if buffered:
+        yield b'\n'.join(buffered) + b'\n'
+
+def stream_response(fragments, headers=None):
+    """Streams encoded summaries as NDJSON, one recipe per line, sent in chunks as the generator yields them."""
+    return Response(_ndjson_chunks(fragments), mimetype='application/x-ndjson', headers=headers)
+
+def _etagged(body):
+    # A document's strong ETag is the digest of its exact bytes
+    return body, hashlib.sha256(body).hexdigest()[:32]
+
+def _document(key, build):
+    documents = _current()['documents']
+    document = documents.get(key)
+    if document is None:
+        document = documents[key] = _etagged(build())
+    return document
+
+def _detail_document(recipe):
+    details = _current()['details']
+    document = details.get(recipe.name)
+    if document is None:
+        document = _etagged(_dumps(recipe.to_dict()) + b'\n')
+        details.set(recipe.name, document)
+    return document
+
+def catalog_response(document):
+    """Serves a cached catalog document, answering If-None-Match with a bodiless 304."""
+    body, etag = document
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    # Per-user auth in front, and the catalog can change on reload: cache privately, always revalidate
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+def _all_recipes_body():
+    ordered = sorted(models.recipe_store.values(), key=lambda r: r.name)
+    return recipes_response([summary(r) for r in ordered]).get_data()
+
+def _ingredients_body():
+    return _dumps({"ingredients": models.all_ingredients}) + b'\n'
+
+def all_recipes_response():
+    return catalog_response(_document('all', _all_recipes_body))
+
+def ingredients_response():
+    return catalog_response(_document('ingredients', _ingredients_body))
+
+def recipe_detail_response(recipe):
+    return catalog_response(_detail_document(recipe))
+
+def warm():
+    """Encodes the catalog-wide documents (and with them every summary prefix) ahead of the first request."""
+    _document('all', _all_recipes_body)
+    _document('ingredients', _ingredients_body)
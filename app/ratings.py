@@ -0,0 +1,98 @@
+import threading
+import time
+from sqlalchemy import case, event, func, inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, object_session
+from .models import RecipeRating, RecipeRatingStats, db
+
+# Every RecipeRating insert, update and delete adjusts RecipeRatingStats in the same flush,
+# so the aggregate commits (or rolls back) together with the rating itself. The cached
+# leaderboard is dropped once such a transaction commits, never before.
+_stats = RecipeRatingStats.__table__
+_leaderboard = {'expires': 0.0, 'names': []}
+_leaderboard_lock = threading.Lock()
+_settings = {'ttl': 60, 'size': 5}
+
+def configure(ttl=60, size=5):
+    with _leaderboard_lock:
+        _settings.update(ttl=ttl, size=size)
+        _leaderboard['expires'] = 0.0
+
+def _apply(connection, recipe_name, old=None, new=None):
+    deltas = {'rating_sum': (new or 0) - (old or 0),
+              'rating_count': (new is not None) - (old is not None)}
+    for stars, delta in ((old, -1), (new, 1)):
+        if stars in range(1, 6):
+            column = f'stars_{stars}'
+            deltas[column] = deltas.get(column, 0) + delta
+
+    update = _stats.update().where(_stats.c.recipe_name == recipe_name).values(
+        {column: _stats.c[column] + delta for column, delta in deltas.items()})
+    if connection.execute(update).rowcount == 0:
+        try:
+            with connection.begin_nested():
+                connection.execute(_stats.insert().values(recipe_name=recipe_name, **{
+                    column.name: deltas.get(column.name, 0) for column in _stats.c if column.name != 'recipe_name'}))
+        except IntegrityError:
+            # A concurrent writer created the row first
+            connection.execute(update)
+
+def _mark_changed(target):
+    session = object_session(target)
+    if session is not None:
+        session.info['ratings_changed'] = True
+
+@event.listens_for(Session, 'after_commit')
+def _ratings_committed(session):
+    if session.info.pop('ratings_changed', False):
+        _leaderboard['expires'] = 0.0
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _ratings_rolled_back(session, previous_transaction):
+    session.info.pop('ratings_changed', None)
+
+@event.listens_for(RecipeRating, 'after_insert')
+def _rating_inserted(mapper, connection, target):
+    _apply(connection, target.recipe_name, new=int(target.rating))
+    _mark_changed(target)
+
+@event.listens_for(RecipeRating, 'after_update')
+def _rating_updated(mapper, connection, target):
+    history = inspect(target).attrs.rating.history
+    if history.has_changes() and history.deleted:
+        _apply(connection, target.recipe_name, old=int(history.deleted[0]), new=int(target.rating))
+        _mark_changed(target)
+
+@event.listens_for(RecipeRating, 'after_delete')
+def _rating_deleted(mapper, connection, target):
+    _apply(connection, target.recipe_name, old=int(target.rating))
+    _mark_changed(target)
+
+def recipe_stats(recipe_name):
+    return db.session.get(RecipeRatingStats, recipe_name)
+
+def top_rated():
+    """Recipe names by average rating then rating count, cached for the configured TTL."""
+    now = time.time()
+    if _leaderboard['expires'] > now:
+        return _leaderboard['names']
+    with _leaderboard_lock:
+        if _leaderboard['expires'] <= now:
+            rows = db.session.query(RecipeRatingStats.recipe_name).filter(RecipeRatingStats.rating_count > 0).order_by(
+                (RecipeRatingStats.rating_sum * 1.0 / RecipeRatingStats.rating_count).desc(),
+                RecipeRatingStats.rating_count.desc(), RecipeRatingStats.recipe_name
+            ).limit(_settings['size']).all()
+            _leaderboard['names'] = [r.recipe_name for r in rows]
+            _leaderboard['expires'] = now + _settings['ttl']
+        return _leaderboard['names']
+
+def backfill_stats():
+    """Builds the aggregates from the ratings table when they are missing (e.g. an existing database)."""
+    if db.session.query(RecipeRatingStats.recipe_name).first() or not db.session.query(RecipeRating.id).first():
+        return
+    histogram = [func.sum(case((RecipeRating.rating == stars, 1), else_=0)) for stars in range(1, 6)]
+    rows = db.session.query(RecipeRating.recipe_name, func.sum(RecipeRating.rating), func.count(RecipeRating.id),
+                            *histogram).group_by(RecipeRating.recipe_name).all()
+    db.session.execute(_stats.insert(), [
+        dict(zip([c.name for c in _stats.c], row)) for row in rows])
+    db.session.commit()
@@ -1,141 +1,316 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, current_app, url_for
+from werkzeug.exceptions import RequestEntityTooLarge
 from .utils import token_required
-from .models import all_ingredients, recipe_store, SUBSTITUTION_MAP, FavoriteRecipe, UserProfile, db, RecipeRating
-from sqlalchemy import func
-import math
+from .models import canonical_ingredients, recipe_store, FavoriteRecipe, UserProfile, db, RecipeRating, RecipeRatingStats
+from .scoring import get_engine
+from .payloads import (summary, recipes_response, stream_response, all_recipes_response, ingredients_response,
+                       recipe_detail_response)
+from . import suggestions as suggestion_model
+from . import recognition
+from . import results
+from .ratings import recipe_stats, top_rated
+from .autocomplete import get_index
+from .canonical import canonical_name
+from .substitutions import Pantry
+from . import models
+from .metrics import stage, observe_count
+import logging
+import time
+import numpy as np
 
 recipes_bp = Blueprint('recipes', __name__)
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 50
+# Most items accepted by one batch request
+MAX_BATCH_SIZE = 200
+# Largest serving count recipes are scaled to
+MAX_SERVINGS = 100
+# What /all and /favorites can be sorted by
+SORT_KEYS = ('name', 'cook_time')
+LISTING_ARGS = ('dietary', 'difficulty', 'max_time', 'sort', 'limit', 'cursor', 'stream')
+# Recipes formatted per batch of a streamed /generate
+STREAM_BATCH_SIZE = 256
+_orders = {}
 
 def calculate_match_score(recipe_ingredients, user_ingredients):
+    """user_ingredients is a substitutions.Pantry, or any iterable of names to build one from."""
+    if not isinstance(user_ingredients, Pantry):
+        user_ingredients = Pantry(user_ingredients, models.substitution_graph)
     perfect_matches = 0
-    substitution_matches = 0
+    substitution_score = 0
     made_substitutions = {}
-    
-    user_ingredients_set = set(user_ingredients)
 
-    for required_ing in recipe_ingredients:
-        if required_ing in user_ingredients_set:
+    # Compared in canonical form; substitutions are reported with the user's own spelling.
+    # Two spellings of one ingredient in a recipe count once
+    required = {}
+    for ing in recipe_ingredients:
+        required.setdefault(canonical_name(ing), ing)
+
+    for canonical, required_ing in required.items():
+        if canonical in user_ingredients.names:
             perfect_matches += 1
-        else:
-            possible_subs = SUBSTITUTION_MAP.get(required_ing, [])
-            for sub in possible_subs:
-                if sub in user_ingredients_set:
-                    substitution_matches += 1
-                    made_substitutions[required_ing] = sub
-                    break
-            
-    if len(recipe_ingredients) == 0:
+        elif canonical in user_ingredients.substitutes:
+            sub, confidence = user_ingredients.substitutes[canonical]
+            substitution_score += confidence
+            made_substitutions[required_ing] = user_ingredients.names[sub]
+
+    if len(required) == 0:
         return 0, {}
         
-    score = (perfect_matches + (substitution_matches * 0.7)) / len(recipe_ingredients)
+    score = (perfect_matches + substitution_score) / len(required)
     
-    if perfect_matches + substitution_matches == 0:
+    if perfect_matches == 0 and not made_substitutions:
         return 0, {}
 
     return score, made_substitutions
 
+def _servings_arg():
+    """(servings, error): servings is None when ?servings= is absent; out-of-range values are an error."""
+    if 'servings' not in request.args:
+        return None, None
+    servings = request.args.get('servings', type=int)
+    if servings is None or not 1 <= servings <= MAX_SERVINGS:
+        return None, f'servings must be a whole number from 1 to {MAX_SERVINGS}'
+    return servings, None
+
+def _scaled(engine, rows, servings):
+    """Ingredient quantities of the recipes at `rows`, scaled to `servings` in one pass.
+
+    Nutrition is listed per serving, so it stays as the catalog has it.
+    """
+    factors = engine.scale(rows, servings)
+    recipes = [recipe_store.by_row(row) for row in rows]
+    lengths = [len(recipe.quantities) for recipe in recipes]
+    quantities = np.concatenate([np.frombuffer(recipe.quantities) for recipe in recipes] or [np.zeros(0)])
+    quantities = np.round(quantities * np.repeat(factors, lengths), 2).tolist()
+
+    scaled, start = [], 0
+    for recipe, length in zip(recipes, lengths):
+        scaled.append({
+            "servings": servings,
+            "ingredients": dict(zip(recipe.ingredients, quantities[start:start + length]))
+        })
+        start += length
+    return scaled
+
+def _filter_args():
+    dietary = request.args.get('dietary', 'all')
+    difficulty = request.args.get('difficulty', 'all')
+    return {
+        'dietary': dietary if dietary != 'all' else None,
+        'difficulty': difficulty if difficulty != 'all' else None,
+        'max_time': request.args.get('max_time', type=int) or None
+    }
+
+def _streaming():
+    return request.args.get('stream') == 'ndjson'
+
+def _catalog_order(engine, sort):
+    """(order, rank): catalog rows sorted by `sort` ("name" or "cook_time", "-" prefix for descending,
+    ties in catalog order) and each row's position in that order. Cached per catalog version."""
+    if _orders.get('version') != engine.version:
+        _orders.clear()
+        _orders['version'] = engine.version
+    cached = _orders.get(sort)
+    if cached is None:
+        if sort.lstrip('-') == 'name':
+            values = np.empty(engine.size, dtype=np.int64)
+            values[np.argsort(np.array(recipe_store.keys(), dtype=str), kind='stable')] = np.arange(engine.size)
+        else:
+            values = np.empty(engine.size, dtype=np.float64)
+            values[engine.cook_time_order] = engine.sorted_cook_times
+        order = np.argsort(-values if sort.startswith('-') else values, kind='stable')
+        rank = np.empty(engine.size, dtype=np.int64)
+        rank[order] = np.arange(engine.size)
+        cached = _orders[sort] = (order, rank)
+    return cached
+
+def _listing(rows=None):
+    """Catalog rows (or just `rows`) passing the request's filters, in its `sort` order.
+
+    Returns (rows, next_cursor, error): the ?cursor/?limit window of them, where the next one
+    starts (None on the last page or without a limit), and an error message for bad parameters.
+    """
+    sort = request.args.get('sort')
+    if sort is not None and sort.lstrip('-') not in SORT_KEYS:
+        return None, None, f"sort must be one of {', '.join(SORT_KEYS)}, optionally prefixed with '-'"
+    engine = get_engine()
+    if rows is None:
+        rows = _catalog_order(engine, sort or 'name')[0]
+    elif sort:
+        rows = rows[np.argsort(_catalog_order(engine, sort)[1][rows], kind='stable')]
+    mask = engine.filter_mask(**_filter_args())
+    if mask is not None:
+        rows = rows[mask[rows]]
+
+    cursor = max(request.args.get('cursor', 0, type=int), 0)
+    limit = request.args.get('limit', type=int)
+    if limit is None:
+        return rows[cursor:], None, None
+    limit = max(limit, 1) if _streaming() else min(max(limit, 1), MAX_PAGE_SIZE)
+    return rows[cursor:cursor + limit], cursor + limit if cursor + limit < len(rows) else None, None
+
+def _list_response(rows, next_cursor, paged):
+    fragments = (summary(recipe_store.by_row(row)) for row in rows)
+    if _streaming():
+        return stream_response(fragments, {'X-Next-Cursor': str(next_cursor)} if next_cursor is not None else None)
+    return recipes_response(list(fragments), **({'next_cursor': next_cursor} if paged else {}))
+
+def _recognition_response(concepts):
+    final_ingredients = recognition.known_ingredients(concepts, canonical_ingredients)
+    if not final_ingredients:
+        return jsonify({'message': 'Could not recognize any known ingredients.'}), 404
+    return jsonify({"recognized_ingredients": final_ingredients})
+
+@recipes_bp.errorhandler(RequestEntityTooLarge)
+def _body_too_large(e):
+    # MAX_CONTENT_LENGTH applies to every route here, not only image uploads
+    return jsonify({'message': 'Request body too large.'}), 413
+
+def _recognition_job_response(job_id):
+    state = recognition.recognizer.job(job_id)
+    if state is None:
+        return jsonify({'message': 'Recognition job not found'}), 404
+    if state['status'] == 'pending':
+        if time.time() - state['submitted'] > current_app.config['RECOGNITION_TIMEOUT']:
+            return jsonify({'message': 'Image recognition timed out.'}), 504
+        response = jsonify({'job_id': job_id, 'status': 'pending'})
+        response.headers['Location'] = url_for('recipes.recognition_job', job_id=job_id)
+        return response, 202
+    if state['status'] == 'failed':
+        return jsonify({'message': state['message']}), state['code']
+    return _recognition_response(state['concepts'])
+
 @recipes_bp.route("/recognize-ingredients", methods=['POST'])
 @token_required
 def recognize_ingredients(current_user):
+    # Never waits on the recognizer: answers from the cache, or 202 with a job to poll
     if 'image' not in request.files:
         return jsonify({'message': 'No image file provided'}), 400
 
-    image_file = request.files['image']
-    image_bytes = image_file.read()
-
     try:
-        CLARIFAI_PAT = "deb567833d0c44789a5b2b0840802b06"
-
-        if not CLARIFAI_PAT or CLARIFAI_PAT == "YOUR_VERIFIED_PERSONAL_ACCESS_TOKEN":
-            return jsonify({'message': 'Server configuration error: PAT not set.'}), 500
-
-        from clarifai.client.model import Model
-        model = Model("https://clarifai.com/clarifai/main/models/food-item-recognition", pat=CLARIFAI_PAT)
-        response = model.predict_by_bytes(image_bytes, input_type="image")
-        
-        if response.status.code != 10000:
-            return jsonify({'message': 'Image recognition failed due to API error.'}), 500
-
-        concepts = response.outputs[0].data.concepts
-        recognized_items = [concept.name.lower() for concept in concepts if concept.value > 0.4]
-        final_ingredients = [item for item in recognized_items if item in all_ingredients]
-        
-        if not final_ingredients:
-            return jsonify({'message': 'Could not recognize any known ingredients.'}), 404
-
-        return jsonify({"recognized_ingredients": final_ingredients})
-    except Exception as e:
-        print(f"Clarifai Error: {e}")
-        return jsonify({'message': 'Image recognition failed.'}), 500
+        image_bytes = recognition.read_upload(request.files['image'].stream, current_app.config['RECOGNITION_MAX_UPLOAD'])
+        job_id = recognition.recognizer.submit(image_bytes)
+    except recognition.RecognitionBusy:
+        return jsonify({'message': 'Image recognition is busy, please try again shortly.'}), 503
+    except recognition.UploadTooLarge:
+        return jsonify({'message': 'Image is too large.'}), 413
+    return _recognition_job_response(job_id)
+
+@recipes_bp.route("/recognize-ingredients/jobs/<job_id>", methods=['GET'])
+@token_required
+def recognition_job(current_user, job_id):
+    # Job ids are the image's sha256, so only someone holding the image can name one
+    return _recognition_job_response(job_id)
 
 @recipes_bp.route("/ingredients")
 @token_required
 def get_ingredients(current_user):
-    return jsonify({"ingredients": all_ingredients})
+    return ingredients_response()
 
-@recipes_bp.route("/generate", methods=["POST"])
+@recipes_bp.route("/ingredients/search")
 @token_required
-def generate(current_user):
-    # Get filters from query parameters
-    dietary_filter = request.args.get('dietary', 'all')
-    difficulty_filter = request.args.get('difficulty', 'all')
-    max_time_filter = request.args.get('max_time', type=int)
-
-    # 1. Start with all recipes
-    filtered_recipes = list(recipe_store.values())
-
-    # 2. Apply filters
-    if dietary_filter != 'all':
-        filtered_recipes = [r for r in filtered_recipes if dietary_filter in r.tags]
-    
-    if difficulty_filter != 'all':
-        filtered_recipes = [r for r in filtered_recipes if r.difficulty == difficulty_filter]
+def search_ingredients(current_user):
+    query = request.args.get('q', '')
+    limit = min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    return jsonify({"ingredients": get_index().complete(query, limit)})
 
-    if max_time_filter:
-        filtered_recipes = [r for r in filtered_recipes if r.cook_time <= max_time_filter]
+@recipes_bp.route("/ingredients/resolve", methods=["POST"])
+@token_required
+def resolve_ingredients(current_user):
+    # Maps each typed name to the catalog's spelling of it ("Tomatoes" -> "tomato"), or null if unknown
+    data = request.get_json(silent=True) or {}
+    names = data.get('ingredients')
+
+    if not isinstance(names, list) or not 0 < len(names) <= MAX_BATCH_SIZE:
+        return jsonify({'message': f'ingredients must be a list of 1 to {MAX_BATCH_SIZE} names'}), 400
+    for i, name in enumerate(names):
+        if not isinstance(name, str):
+            return jsonify({'message': 'Invalid ingredient name supplied', 'index': i}), 400
+    return jsonify({"ingredients": {name: canonical_ingredients.get(canonical_name(name)) for name in names}})
+
+def _ranked_summaries(engine, rows, pantry, servings):
+    # Only the returned recipes need their substitutions spelled out
+    for start in range(0, len(rows), STREAM_BATCH_SIZE):
+        batch = rows[start:start + STREAM_BATCH_SIZE]
+        scaled = _scaled(engine, batch, servings) if servings else [None] * len(batch)
+        for row, scaled_fields in zip(batch, scaled):
+            recipe = recipe_store.by_row(row)
+            _, substitutions = calculate_match_score(recipe.ingredients.keys(), pantry)
+            yield summary(recipe, substitutions, scaled_fields)
 
-    # 3. Perform ingredient matching on the filtered list
+@recipes_bp.route("/generate", methods=["POST"])
+@token_required
+def generate(current_user):
+    filters = _filter_args()
+    # ?stream=ndjson sends one recipe per line, all matches unless a limit is given
+    stream = _streaming()
+    # Pagination: cursor is the offset handed back as next_cursor by the previous page
+    limit = request.args.get('limit', type=int)
+    cursor = max(request.args.get('cursor', 0, type=int), 0)
+    # Opt-in: score by how much of each recipe's quantities the pantry covers, at `servings` if given
+    quantities = request.args.get('quantities', 'false').lower() in ('1', 'true', 'yes')
+    servings, error = _servings_arg()
+    if error:
+        return jsonify({'message': error}), 400
+
+    # The pantry's best substitutes are worked out once here, not once per recipe
+    engine = get_engine()
+    if stream:
+        limit = max(limit, 1) if limit is not None else engine.size
+    else:
+        limit = min(max(DEFAULT_PAGE_SIZE if limit is None else limit, 1), MAX_PAGE_SIZE)
     data = request.json
-    ingredients_from_user = data.get("ingredients", {}).keys()
-    
-    scores = []
-    for recipe in filtered_recipes:
-        score, substitutions = calculate_match_score(recipe.ingredients.keys(), ingredients_from_user)
-        if score > 0.1:
-            scores.append((recipe.name, score, substitutions))
-            
-    scores.sort(key=lambda x: x[1], reverse=True)
-    
-    # 4. Format results
-    results = []
-    for r_name, score, subs in scores[:10]:
-        rec = recipe_store[r_name]
-        results.append({
-            "name": rec.name,
-            "difficulty": rec.difficulty,
-            "cook_time": rec.cook_time,
-            "cuisine": rec.cuisine,
-            "image_url": rec.image_url,
-            "substitutions": subs
-        })
-    return jsonify({"recipes": results})
+    with stage('pantry'):
+        pantry = Pantry(data.get("ingredients", {}), engine.substitutions)
+
+    # Repeated pantries (recognition yields stable ingredient sets) are answered from the result cache
+    key = None
+    if results.cache.enabled and not stream:
+        with stage('cache'):
+            key = results.cache.key(pantry, quantities, servings, limit=limit, cursor=cursor, **filters)
+            body = results.cache.get(key)
+        if body is not None:
+            return Response(body, mimetype='application/json')
+
+    # 1. Intersect the precomputed filter indexes instead of copying the catalog per filter
+    with stage('filter'):
+        mask = engine.filter_mask(**filters)
+    observe_count('scoring_candidates', engine.size if mask is None else int(mask.sum()))
+
+    # 2. Score the whole catalog in one batch, restricted to the rows that passed the filters
+    with stage('score'):
+        rows, _, total = engine.rank(pantry, mask, limit=limit, offset=cursor, quantities=quantities, servings=servings)
+    observe_count('scoring_matches', total)
+    next_cursor = cursor + limit if cursor + limit < total else None
+
+    # 3. Format results from the cached summaries
+    if stream:
+        headers = {'X-Total-Count': str(total)}
+        if next_cursor is not None:
+            headers['X-Next-Cursor'] = str(next_cursor)
+        return stream_response(_ranked_summaries(engine, rows, pantry, servings), headers)
+    with stage('substitutions'):
+        summaries = list(_ranked_summaries(engine, rows, pantry, servings))
+    with stage('encode'):
+        response = recipes_response(summaries, next_cursor=next_cursor)
+    if key is not None:
+        with stage('cache'):
+            results.cache.put(key, response.get_data())
+    return response
 
 @recipes_bp.route("/all", methods=["GET"])
 @token_required
 def get_all_recipes(current_user):
-    results = []
-    sorted_recipes = sorted(recipe_store.values(), key=lambda r: r.name)
-
-    for rec in sorted_recipes:
-        results.append({
-            "name": rec.name,
-            "difficulty": rec.difficulty,
-            "cook_time": rec.cook_time,
-            "cuisine": rec.cuisine,
-            "image_url": rec.image_url,
-            "substitutions": {}
-        })
-    return jsonify({"recipes": results})
+    # The plain listing is one cached document; filtered, sorted, paged or streamed ones are built per request
+    if not any(arg in request.args for arg in LISTING_ARGS):
+        return all_recipes_response()
+    rows, next_cursor, error = _listing()
+    if error:
+        return jsonify({'message': error}), 400
+    return _list_response(rows, next_cursor, 'limit' in request.args)
 
 @recipes_bp.route("/favorites", methods=["POST"])
 @token_required
@@ -156,26 +331,39 @@ def add_favorite(current_user):
     
     return jsonify({'message': 'Recipe added to favorites successfully!'}), 201
 
+@recipes_bp.route("/favorites/batch", methods=["POST"])
+@token_required
+def add_favorites_batch(current_user):
+    data = request.get_json(silent=True) or {}
+    recipe_names = data.get('recipe_names')
+
+    if not isinstance(recipe_names, list) or not 0 < len(recipe_names) <= MAX_BATCH_SIZE:
+        return jsonify({'message': f'recipe_names must be a list of 1 to {MAX_BATCH_SIZE} recipe names'}), 400
+    for i, recipe_name in enumerate(recipe_names):
+        if not isinstance(recipe_name, str) or recipe_name not in recipe_store:
+            return jsonify({'message': 'Invalid recipe name supplied', 'index': i}), 400
+
+    recipe_names = list(dict.fromkeys(recipe_names))
+    existing = {f.recipe_name for f in FavoriteRecipe.query.filter(
+        FavoriteRecipe.user_id == current_user.id, FavoriteRecipe.recipe_name.in_(recipe_names)
+    ).all()}
+    added = [name for name in recipe_names if name not in existing]
+    db.session.add_all([FavoriteRecipe(user_id=current_user.id, recipe_name=name) for name in added])
+    db.session.commit()
+
+    return jsonify({'added': added, 'already_favorites': [name for name in recipe_names if name in existing]}), 201
+
 @recipes_bp.route("/favorites", methods=["GET"])
 @token_required
 def get_favorites(current_user):
     favorite_entries = FavoriteRecipe.query.filter_by(user_id=current_user.id).all()
     favorite_recipe_names = [f.recipe_name for f in favorite_entries]
-    
-    results = []
-    for name in favorite_recipe_names:
-        rec = recipe_store.get(name)
-        if rec:
-            results.append({
-                "name": rec.name,
-                "difficulty": rec.difficulty,
-                "cook_time": rec.cook_time,
-                "cuisine": rec.cuisine,
-                "image_url": rec.image_url,
-                "substitutions": {}
-            })
-            
-    return jsonify({"recipes": results})
+
+    rows = np.array([recipe_store.row(name) for name in favorite_recipe_names if name in recipe_store], dtype=np.int64)
+    rows, next_cursor, error = _listing(rows)
+    if error:
+        return jsonify({'message': error}), 400
+    return _list_response(rows, next_cursor, 'limit' in request.args)
 
 @recipes_bp.route("/recipe/<recipe_name>")
 @token_required
@@ -183,7 +371,33 @@ def get_recipe_details(current_user, recipe_name):
     recipe = recipe_store.get(recipe_name)
     if not recipe:
         return jsonify({"message": "Recipe not found"}), 404
-    return jsonify(vars(recipe))
+    servings, error = _servings_arg()
+    if error:
+        return jsonify({'message': error}), 400
+    if servings:
+        # Scaled details vary per request, so they skip the cached catalog document
+        return jsonify(dict(recipe.to_dict(), **_scaled(get_engine(), [recipe_store.row(recipe_name)], servings)[0]))
+    return recipe_detail_response(recipe)
+
+def _parse_rating(recipe_name, rating):
+    # The per-recipe histogram only has buckets for 1-5 stars
+    if not all([recipe_name, rating]) or not isinstance(recipe_name, str) or recipe_name not in recipe_store:
+        return None
+    # Whole stars only: JSON true or 4.7 must not be stored as 1 or 4
+    if isinstance(rating, bool) or not isinstance(rating, (int, float)):
+        return None
+    if isinstance(rating, float) and not rating.is_integer():
+        return None
+    rating = int(rating)
+    return rating if 1 <= rating <= 5 else None
+
+def _ratings_payload(stats, user_rating):
+    return {
+        "average_rating": stats.average if stats else 0,
+        "rating_count": stats.rating_count if stats else 0,
+        "rating_histogram": stats.histogram if stats else {str(stars): 0 for stars in range(1, 6)},
+        "user_rating": user_rating
+    }
 
 @recipes_bp.route("/rate", methods=["POST"])
 @token_required
@@ -192,10 +406,12 @@ def rate_recipe(current_user):
     recipe_name = data.get('recipe_name')
     rating = data.get('rating')
 
-    if not all([recipe_name, rating]) or recipe_name not in recipe_store:
+    rating = _parse_rating(recipe_name, rating)
+    if rating is None:
         return jsonify({'message': 'Invalid data provided'}), 400
     
     existing_rating = RecipeRating.query.filter_by(user_id=current_user.id, recipe_name=recipe_name).first()
+    old_rating = existing_rating.rating if existing_rating else None
     if existing_rating:
         existing_rating.rating = rating
     else:
@@ -203,81 +419,91 @@ def rate_recipe(current_user):
         db.session.add(new_rating)
     
     db.session.commit()
+    suggestion_model.record_rating(current_user.id, recipe_name, old_rating, rating)
     return jsonify({'message': 'Rating saved successfully'}), 200
 
+@recipes_bp.route("/rate/batch", methods=["POST"])
+@token_required
+def rate_recipes_batch(current_user):
+    data = request.get_json(silent=True) or {}
+    items = data.get('ratings')
+
+    if not isinstance(items, list) or not 0 < len(items) <= MAX_BATCH_SIZE:
+        return jsonify({'message': f'ratings must be a list of 1 to {MAX_BATCH_SIZE} items'}), 400
+    # Later entries for the same recipe win
+    new_ratings = {}
+    for i, item in enumerate(items):
+        rating = _parse_rating(item.get('recipe_name'), item.get('rating')) if isinstance(item, dict) else None
+        if rating is None:
+            return jsonify({'message': 'Invalid data provided', 'index': i}), 400
+        new_ratings[item['recipe_name']] = rating
+
+    # One lookup for the existing rows, one commit for the whole batch
+    existing = {r.recipe_name: r for r in RecipeRating.query.filter(
+        RecipeRating.user_id == current_user.id, RecipeRating.recipe_name.in_(list(new_ratings))
+    ).all()}
+    changes = []
+    for recipe_name, rating in new_ratings.items():
+        row = existing.get(recipe_name)
+        changes.append((recipe_name, row.rating if row else None, rating))
+        if row:
+            row.rating = rating
+        else:
+            db.session.add(RecipeRating(user_id=current_user.id, recipe_name=recipe_name, rating=rating))
+    db.session.commit()
+
+    suggestion_model.record_ratings(current_user.id, changes)
+    return jsonify({'message': f'{len(new_ratings)} ratings saved successfully'}), 200
+
 @recipes_bp.route("/recipe/<recipe_name>/ratings", methods=["GET"])
 @token_required
 def get_recipe_ratings(current_user, recipe_name):
     if recipe_name not in recipe_store:
         return jsonify({"message": "Recipe not found"}), 404
 
-    avg_rating, rating_count = db.session.query(
-        func.avg(RecipeRating.rating), func.count(RecipeRating.id)
-    ).filter(RecipeRating.recipe_name == recipe_name).first()
+    stats = recipe_stats(recipe_name)
     
     user_rating_obj = RecipeRating.query.filter_by(user_id=current_user.id, recipe_name=recipe_name).first()
     user_rating = user_rating_obj.rating if user_rating_obj else 0
 
-    return jsonify({
-        "average_rating": float(avg_rating) if avg_rating else 0,
-        "rating_count": rating_count if rating_count else 0,
-        "user_rating": user_rating
-    })
+    return jsonify(_ratings_payload(stats, user_rating))
+
+@recipes_bp.route("/ratings/batch", methods=["POST"])
+@token_required
+def get_ratings_batch(current_user):
+    # The ratings view of several recipes in one round trip; a body, as 200 names overflow a URL
+    data = request.get_json(silent=True) or {}
+    recipe_names = data.get('recipe_names')
+
+    if not isinstance(recipe_names, list) or not 0 < len(recipe_names) <= MAX_BATCH_SIZE:
+        return jsonify({'message': f'recipe_names must be a list of 1 to {MAX_BATCH_SIZE} recipe names'}), 400
+    for i, recipe_name in enumerate(recipe_names):
+        if not isinstance(recipe_name, str):
+            return jsonify({'message': 'Invalid recipe name supplied', 'index': i}), 400
+
+    # Unknown names are skipped
+    recipe_names = list(dict.fromkeys(name for name in recipe_names if name in recipe_store))
+    stats = {s.recipe_name: s for s in RecipeRatingStats.query.filter(
+        RecipeRatingStats.recipe_name.in_(recipe_names)).all()} if recipe_names else {}
+    user_ratings = {r.recipe_name: r.rating for r in RecipeRating.query.filter(
+        RecipeRating.user_id == current_user.id, RecipeRating.recipe_name.in_(recipe_names)).all()} if recipe_names else {}
+
+    return jsonify({'ratings': {name: _ratings_payload(stats.get(name), user_ratings.get(name, 0))
+                                for name in recipe_names}})
 
 @recipes_bp.route("/suggestions", methods=["GET"])
 @token_required
 def get_suggestions(current_user):
-    user_high_ratings = {r.recipe_name for r in RecipeRating.query.filter(
-        RecipeRating.user_id == current_user.id, RecipeRating.rating >= 3
-    ).all()}
+    user_high_ratings = suggestion_model.user_likes(current_user.id)
 
     suggestions = []
 
-    def get_top_rated_fallback():
-        top_recipes = db.session.query(
-            RecipeRating.recipe_name
-        ).group_by(RecipeRating.recipe_name).order_by(
-            func.avg(RecipeRating.rating).desc(), func.count(RecipeRating.id).desc()
-        ).limit(5).all()
-        return [r.recipe_name for r in top_recipes]
+    if user_high_ratings:
+        # Co-liked recipes come from the precomputed item-item model, not per-request joins
+        suggestions = suggestion_model.get_model().suggest(user_high_ratings, k=5)
 
-    if not user_high_ratings:
-        suggestions = get_top_rated_fallback()
-    else:
-        similar_users = db.session.query(RecipeRating.user_id).filter(
-            RecipeRating.recipe_name.in_(user_high_ratings),
-            RecipeRating.user_id != current_user.id,
-            RecipeRating.rating >= 3
-        ).distinct().limit(50).all()
-        
-        similar_user_ids = [u.user_id for u in similar_users]
-
-        if similar_user_ids:
-            recommended_recipes = db.session.query(
-                RecipeRating.recipe_name
-            ).filter(
-                RecipeRating.user_id.in_(similar_user_ids),
-                RecipeRating.rating >= 3,
-                ~RecipeRating.recipe_name.in_(user_high_ratings)
-            ).group_by(RecipeRating.recipe_name).order_by(func.count(RecipeRating.user_id).desc()).limit(5).all()
-            
-            suggestions = [r.recipe_name for r in recommended_recipes]
-
-        if not suggestions:
-            suggestions = get_top_rated_fallback()
-
-    results = []
-    for name in suggestions:
-        rec = recipe_store.get(name)
-        if rec:
-            results.append({
-                "name": rec.name,
-                "difficulty": rec.difficulty,
-                "cook_time": rec.cook_time,
-                "cuisine": rec.cuisine,
-                "image_url": rec.image_url,
-                "substitutions": {}
-            })
-    
-    return jsonify({"recipes": results})
+    if not suggestions:
+        suggestions = top_rated()
 
+    payload = [summary(recipe_store[name]) for name in suggestions if name in recipe_store]
+    return recipes_response(payload)
@@ -0,0 +1,333 @@
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+from .canonical import canonical_name
+from .metrics import registry
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; without it uploads are forwarded unchanged
+    Image = None
+
+# Image -> ingredient recognition. Backends turn image bytes into (concept, confidence)
+# pairs; the Recognizer runs them on a small bounded thread pool, shares work between
+# identical in-flight images and caches results by the image's sha256, so a slow
+# upstream only ever ties up the pool, never a request thread. Uploads become jobs named
+# by that sha256, which clients poll; with a shared store (the result cache's Redis) any
+# worker can answer the poll.
+MIN_CONFIDENCE = 0.4
+JOB_PREFIX = 'recognition'
+logger = logging.getLogger(__name__)
+CLARIFAI_MODEL_URL = "https://clarifai.com/clarifai/main/models/food-item-recognition"
+# The food model works on small inputs; larger photos only cost upload time
+DEFAULT_MAX_SIDE = 512
+DEFAULT_JPEG_QUALITY = 85
+
+class RecognitionError(Exception):
+    """The backend answered, but not with a usable result; str(e) is safe to show users."""
+
+class RecognitionBusy(Exception):
+    pass
+
+class UploadTooLarge(Exception):
+    pass
+
+class StageStats:
+    """Count, latency and bytes in/out per pipeline stage (read, decode, resize, encode, upstream)."""
+
+    def __init__(self):
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds, bytes_in=0, bytes_out=0):
+        with self._lock:
+            entry = self._stages.setdefault(stage, {'count': 0, 'seconds': 0.0, 'bytes_in': 0, 'bytes_out': 0})
+            entry['count'] += 1
+            entry['seconds'] += seconds
+            entry['bytes_in'] += bytes_in
+            entry['bytes_out'] += bytes_out
+
+    def snapshot(self):
+        with self._lock:
+            stages = {stage: dict(entry, avg_ms=entry['seconds'] * 1000 / entry['count'])
+                      for stage, entry in self._stages.items()}
+        encode = stages.get('encode', {})
+        return {'stages': stages, 'bytes_saved': encode.get('bytes_in', 0) - encode.get('bytes_out', 0)}
+
+stage_stats = StageStats()
+
+def read_upload(stream, limit, chunk_size=64 * 1024):
+    """Reads an uploaded file, rejecting it if it exceeds limit bytes.
+
+    Werkzeug has already buffered the request body by now; MAX_CONTENT_LENGTH is what
+    bounds how much of it is read off the socket.
+    """
+    start = time.perf_counter()
+    buffer = bytearray()
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        buffer += chunk
+        if len(buffer) > limit:
+            raise UploadTooLarge()
+    stage_stats.record('read', time.perf_counter() - start, len(buffer), len(buffer))
+    return bytes(buffer)
+
+def preprocess(image_bytes, max_side=DEFAULT_MAX_SIDE, quality=DEFAULT_JPEG_QUALITY):
+    """Downscales to max_side and re-encodes as a JPEG without EXIF/ICC metadata.
+
+    Bytes Pillow cannot read as an image are forwarded unchanged and left to the backend.
+    """
+    if Image is None:
+        return image_bytes
+    start = time.perf_counter()
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        # JPEGs decode straight at a reduced scale instead of at full resolution
+        image.draft('RGB', (max_side, max_side))
+        # Keep the orientation the EXIF tag asked for; the tag itself is dropped below
+        image = ImageOps.exif_transpose(image)
+    except Image.DecompressionBombError as e:
+        raise UploadTooLarge() from e
+    except (OSError, ValueError):
+        return image_bytes
+    decoded = time.perf_counter()
+    stage_stats.record('decode', decoded - start, len(image_bytes))
+
+    if max(image.size) > max_side:
+        image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    resized = time.perf_counter()
+    stage_stats.record('resize', resized - decoded)
+
+    out = io.BytesIO()
+    image.save(out, 'JPEG', quality=quality, optimize=True)
+    encoded = out.getvalue()
+    stage_stats.record('encode', time.perf_counter() - resized, len(image_bytes), len(encoded))
+    return encoded
+
+class ClarifaiBackend:
+    name = 'clarifai'
+
+    def __init__(self, pat, model_url=CLARIFAI_MODEL_URL):
+        self.pat = pat
+        self.model_url = model_url
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _client(self):
+        # One client (and its gRPC channel) per process, reused by every recognition
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from clarifai.client.model import Model
+                    self._model = Model(self.model_url, pat=self.pat)
+        return self._model
+
+    def warm(self):
+        # Import only: the client's gRPC channel is opened per process, on first use
+        import clarifai.client.model
+
+    def concepts(self, image_bytes):
+        if not self.pat or self.pat == "YOUR_VERIFIED_PERSONAL_ACCESS_TOKEN":
+            raise RecognitionError('Server configuration error: PAT not set.')
+        response = self._client().predict_by_bytes(image_bytes, input_type="image")
+        if response.status.code != 10000:
+            raise RecognitionError('Image recognition failed due to API error.')
+        return [(concept.name, concept.value) for concept in response.outputs[0].data.concepts]
+
+class StubBackend:
+    """Offline backend: a UTF-8 "image" is read as one ingredient name per line (or comma), all at confidence 1.0."""
+    name = 'stub'
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+
+    def warm(self):
+        pass
+
+    def concepts(self, image_bytes):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        try:
+            text = image_bytes.decode('utf-8')
+        except UnicodeDecodeError:
+            return []
+        return [(name.strip(), 1.0) for name in text.replace(',', '\n').splitlines() if name.strip()]
+
+def _failure(error):
+    """(message, HTTP status) for a failed job; str(e) of a RecognitionError is safe to show users."""
+    if isinstance(error, UploadTooLarge):
+        return 'Image is too large.', 413
+    if isinstance(error, RecognitionError):
+        return str(error), 500
+    return 'Image recognition failed.', 500
+
+class Recognizer:
+    def __init__(self, backend, workers=4, max_pending=32, cache_size=1024, job_ttl=600, prepare=preprocess,
+                 shared=None):
+        self.backend = backend
+        self.prepare = prepare
+        self.workers = workers
+        self.cache_size = cache_size
+        self.job_ttl = job_ttl
+        # get/set store shared by all workers (results.RedisBackend), or None to keep jobs in this process
+        self.shared = shared
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._inflight = {}
+        # job id (the image's sha256) -> (Future, submitted at)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool = None
+        self._pid = None
+
+    def _executor(self):
+        # Created lazily so each worker process gets its own threads
+        if self._pool is None or self._pid != os.getpid():
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='recognition')
+            self._pid = os.getpid()
+        return self._pool
+
+    def _run(self, digest, image_bytes):
+        try:
+            image_bytes = self.prepare(image_bytes)
+            start = time.perf_counter()
+            concepts = self.backend.concepts(image_bytes)
+            stage_stats.record('upstream', time.perf_counter() - start, len(image_bytes))
+        finally:
+            self._slots.release()
+        with self._lock:
+            self._cache[digest] = concepts
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return concepts
+
+    def _forget(self, digest):
+        with self._lock:
+            self._inflight.pop(digest, None)
+
+    def future(self, image_bytes, digest=None):
+        """A Future of the upload's concepts: already resolved on a cache hit, shared with identical in-flight uploads.
+
+        Uploads are keyed by their raw bytes, so a cache hit skips preprocessing as well.
+        """
+        digest = digest or hashlib.sha256(image_bytes).hexdigest()
+        with self._lock:
+            concepts = self._cache.get(digest)
+            if concepts is not None:
+                self._cache.move_to_end(digest)
+                self.hits += 1
+                future = Future()
+                future.set_result(concepts)
+                return future
+            future = self._inflight.get(digest)
+            if future is not None:
+                self.hits += 1
+                return future
+            if not self._slots.acquire(blocking=False):
+                raise RecognitionBusy()
+            self.misses += 1
+            future = self._inflight[digest] = self._executor().submit(self._run, digest, image_bytes)
+        future.add_done_callback(lambda _: self._forget(digest))
+        return future
+
+    def recognize(self, image_bytes, timeout=None):
+        return self.future(image_bytes).result(timeout=timeout)
+
+    def _publish(self, job_id, state):
+        if self.shared is None:
+            return
+        try:
+            self.shared.set(f"{JOB_PREFIX}:{job_id}", json.dumps(state).encode('utf-8'))
+        except Exception:
+            logger.warning("Recognition job store failed", exc_info=True)
+
+    def _finished(self, job_id, future):
+        error = future.exception()
+        if error is None:
+            self._publish(job_id, {'status': 'done', 'concepts': future.result()})
+            return
+        if not isinstance(error, (RecognitionError, UploadTooLarge)):
+            registry.inc('recognition_failures_total', backend=self.backend.name)
+            logger.error("Image recognition job %s failed", job_id, exc_info=error)
+        message, code = _failure(error)
+        self._publish(job_id, {'status': 'failed', 'message': message, 'code': code})
+
+    def submit(self, image_bytes):
+        """Starts (or joins) recognition of an upload without waiting for it; returns the job id, its sha256."""
+        job_id = hashlib.sha256(image_bytes).hexdigest()
+        future = self.future(image_bytes, job_id)
+        now = time.time()
+        with self._lock:
+            for expired in [j for j, (_, submitted) in self._jobs.items() if submitted < now - self.job_ttl]:
+                del self._jobs[expired]
+            entry = self._jobs.get(job_id)
+            new = entry is None or entry[0] is not future
+            if new:
+                self._jobs[job_id] = (future, now)
+        if new:
+            # Published before the callback can run, so "pending" never overwrites the result
+            if not future.done():
+                self._publish(job_id, {'status': 'pending', 'submitted': now})
+            future.add_done_callback(lambda done: self._finished(job_id, done))
+        return job_id
+
+    def job(self, job_id):
+        """The job's state, or None if neither this process nor the shared store knows it.
+
+        {'status': 'pending', 'submitted'}, {'status': 'done', 'concepts'} or {'status': 'failed', 'message', 'code'}.
+        """
+        with self._lock:
+            concepts = self._cache.get(job_id)
+            entry = self._jobs.get(job_id)
+        if concepts is not None:
+            return {'status': 'done', 'concepts': concepts}
+        if entry is not None:
+            future, submitted = entry
+            if not future.done():
+                return {'status': 'pending', 'submitted': submitted}
+            if future.exception() is None:
+                return {'status': 'done', 'concepts': future.result()}
+            message, code = _failure(future.exception())
+            return {'status': 'failed', 'message': message, 'code': code}
+        if self.shared is not None:
+            try:
+                body = self.shared.get(f"{JOB_PREFIX}:{job_id}")
+            except Exception:
+                logger.warning("Recognition job lookup failed", exc_info=True)
+                body = None
+            if body is not None:
+                return json.loads(body)
+        return None
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0, 'cached': len(self._cache),
+                'preprocessing': stage_stats.snapshot()}
+
+def known_ingredients(concepts, canonical_ingredients):
+    """Confident concepts that name a catalog ingredient, spelled the way the catalog spells it."""
+    recognized_items = [canonical_name(name) for name, confidence in concepts if confidence > MIN_CONFIDENCE]
+    return list(dict.fromkeys(canonical_ingredients[item] for item in recognized_items if item in canonical_ingredients))
+
+recognizer = Recognizer(StubBackend())
+
+def configure(backend='clarifai', pat=None, workers=4, max_pending=32, cache_size=1024, job_ttl=600,
+              max_side=DEFAULT_MAX_SIDE, quality=DEFAULT_JPEG_QUALITY, shared=None):
+    global recognizer
+    backend = ClarifaiBackend(pat) if backend == 'clarifai' else StubBackend()
+    recognizer = Recognizer(backend, workers, max_pending, cache_size, job_ttl,
+                            prepare=lambda image_bytes: preprocess(image_bytes, max_side, quality), shared=shared)
@@ -0,0 +1,158 @@
+from collections import OrderedDict
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+from . import models
+try:
+    import redis
+except ImportError:  # redis is optional; without it results are cached per process
+    redis = None
+
+# Encoded /generate responses, keyed by everything that decides them: the pantry in canonical
+# form (so ingredient order, duplicates and spelling variants share an entry), its amounts in
+# quantity mode, the filters, servings and page. Entries live under a namespace naming the
+# catalog and substitution graph they were computed from, so a catalog change never serves
+# stale results. With RESULT_CACHE_URL set they are kept in Redis and shared by all workers.
+DEFAULT_SIZE = 1024
+DEFAULT_TTL = 300
+KEY_PREFIX = 'generate'
+logger = logging.getLogger(__name__)
+
+class LocalBackend:
+    name = 'local'
+
+    def __init__(self, maxsize=DEFAULT_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def set(self, key, body):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def size(self):
+        return len(self._entries)
+
+class RedisBackend:
+    """Entries shared across processes; they expire after `ttl` seconds instead of by LRU."""
+    name = 'redis'
+
+    def __init__(self, client, ttl=DEFAULT_TTL):
+        self.client = client
+        self.ttl = ttl
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def set(self, key, body):
+        self.client.set(key, body, ex=self.ttl)
+
+    def clear(self):
+        # Other namespaces belong to other catalogs, possibly still served by other workers; they expire on their own
+        pass
+
+    def size(self):
+        return None
+
+def catalog_fingerprint():
+    """Names the current catalog and substitution graph: identical in every process serving the same
+    snapshot, and unique to this process when the catalog only exists in its memory."""
+    snapshot = models.recipe_store.pristine_snapshot
+    if snapshot is None:
+        return f"{os.getpid()}-{uuid.uuid4().hex}"
+    graph = models.substitution_graph
+    substitutions = json.dumps([graph.max_hops, graph.min_confidence, sorted(graph.targets.items())])
+    digest = hashlib.sha256(snapshot.digest.encode('ascii'))
+    digest.update(substitutions.encode('utf-8'))
+    return digest.hexdigest()[:32]
+
+class ResultCache:
+    def __init__(self, backend):
+        self.backend = backend
+        # A zero-size local cache turns caching off
+        self.enabled = getattr(backend, 'maxsize', 1) > 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._version = None
+        self._namespace = None
+        self._lock = threading.Lock()
+
+    def namespace(self):
+        if self._version != models.catalog_version:
+            with self._lock:
+                if self._version != models.catalog_version:
+                    version = models.catalog_version
+                    self._namespace = catalog_fingerprint()
+                    self.backend.clear()
+                    self._version = version
+        return self._namespace
+
+    def key(self, pantry, quantities=False, servings=None, **params):
+        """Cache key of a /generate request; `params` are its filters and page, already normalized."""
+        sources = models.substitution_graph.sources
+        # The user's spelling only shows up in the response where the ingredient stands in for another
+        names = [canonical if spelling == canonical or canonical not in sources else [canonical, spelling]
+                 for canonical, spelling in sorted(pantry.names.items())]
+        amounts = sorted(pantry.amounts.items()) if quantities else None
+        encoded = json.dumps([names, amounts, bool(quantities), servings, sorted(params.items())],
+                             separators=(',', ':'))
+        return f"{KEY_PREFIX}:{self.namespace()}:{hashlib.sha256(encoded.encode('utf-8')).hexdigest()}"
+
+    def get(self, key):
+        try:
+            body = self.backend.get(key)
+        except Exception:
+            # A cache outage costs a recomputation, never the request
+            self.errors += 1
+            logger.warning("Result cache lookup failed", exc_info=True)
+            body = None
+        if body is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return body
+
+    def put(self, key, body):
+        try:
+            self.backend.set(key, body)
+        except Exception:
+            self.errors += 1
+            logger.warning("Result cache store failed", exc_info=True)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'backend': self.backend.name, 'hits': self.hits, 'misses': self.misses, 'errors': self.errors,
+                'hit_ratio': self.hits / lookups if lookups else 0.0, 'size': self.backend.size()}
+
+cache = ResultCache(LocalBackend())
+
+def configure(size=DEFAULT_SIZE, url=None, ttl=DEFAULT_TTL):
+    global cache
+    backend = LocalBackend(size)
+    if url:
+        if redis is None:
+            logger.warning("RESULT_CACHE_URL is set but the redis package is not installed; caching per process")
+        else:
+            # Short timeouts: a slow cache must not be slower than recomputing the result
+            backend = RedisBackend(redis.Redis.from_url(url, socket_timeout=0.1, socket_connect_timeout=0.1), ttl)
+    cache = ResultCache(backend)
@@ -0,0 +1,210 @@
+import numpy as np
+from . import models
+from .canonical import canonical_name
+from .substitutions import Pantry
+
+MIN_SCORE = 0.1
+
+class ScoringEngine:
+    """Batch form of calculate_match_score over the whole catalog.
+
+    The catalog is kept as a sparse recipe x ingredient incidence matrix stored
+    column-major (one posting array of recipe rows per ingredient). The pantry's
+    best substitutes come from the SubstitutionGraph once per request, so scoring
+    is a handful of gathers and two bincounts, the second weighted by confidence.
+    Columns are canonical ingredient names (see canonical.py), so "eggs" in a
+    pantry and "egg" in a recipe are the same integer id.
+
+    Each posting also carries the recipe's quantity of the ingredient, and each row
+    its servings, so quantity-aware scoring and scaling to a serving count are array
+    arithmetic over the candidates as well.
+    """
+
+    def __init__(self, recipes, substitutions, version=None):
+        self.version = version
+        self.substitutions = substitutions
+        self.vocab = {}
+
+        rec_rows, ing_cols, amounts, tags, difficulties, cook_times, servings = [], [], [], [], [], [], []
+        for row, recipe in enumerate(recipes):
+            # Two spellings of one ingredient in a recipe are one column with their quantities added up
+            needed = {}
+            for ing, quantity in recipe.ingredients.items():
+                canonical = canonical_name(ing)
+                needed[canonical] = needed.get(canonical, 0.0) + quantity
+            for ing, quantity in needed.items():
+                rec_rows.append(row)
+                ing_cols.append(self.vocab.setdefault(ing, len(self.vocab)))
+                amounts.append(quantity)
+            tags.append(recipe.tags)
+            difficulties.append(recipe.difficulty)
+            cook_times.append(recipe.cook_time)
+            servings.append(recipe.servings or 1)
+        self.size = len(cook_times)
+
+        n_ing = len(self.vocab)
+        rec_rows = np.asarray(rec_rows, dtype=np.int32)
+        ing_cols = np.asarray(ing_cols, dtype=np.int32)
+        self.lengths = np.bincount(rec_rows, minlength=self.size)
+        self.postings, self.postings_ptr = self._compress(ing_cols, rec_rows, n_ing)
+        self.posting_quantities, _ = self._compress(ing_cols, np.asarray(amounts, dtype=np.float64), n_ing)
+        self.servings = np.asarray(servings, dtype=np.float64)
+
+        # Filter indexes: one row mask per tag and per difficulty, plus rows sorted by cook time
+        self.tag_masks, self.difficulty_masks = {}, {}
+        for row, (recipe_tags, difficulty) in enumerate(zip(tags, difficulties)):
+            for tag in recipe_tags:
+                self.tag_masks.setdefault(tag, np.zeros(self.size, dtype=bool))[row] = True
+            self.difficulty_masks.setdefault(difficulty, np.zeros(self.size, dtype=bool))[row] = True
+        cook_times = np.asarray(cook_times, dtype=np.int64)
+        self.cook_time_order = np.argsort(cook_times, kind='stable')
+        self.sorted_cook_times = cook_times[self.cook_time_order]
+
+    ARRAYS = ('lengths', 'postings', 'postings_ptr', 'posting_quantities', 'servings',
+              'cook_time_order', 'sorted_cook_times')
+
+    def to_arrays(self):
+        """Flattens the engine into named arrays plus JSON-able metadata, for catalog snapshots."""
+        arrays = {name: getattr(self, name) for name in self.ARRAYS}
+        for kind, masks in (('tag_masks', self.tag_masks), ('difficulty_masks', self.difficulty_masks)):
+            arrays[kind] = np.stack(list(masks.values())) if masks else np.zeros((0, self.size), dtype=bool)
+        meta = {
+            'size': self.size,
+            'vocab': list(self.vocab),
+            'tags': list(self.tag_masks),
+            'difficulties': list(self.difficulty_masks)
+        }
+        return arrays, meta
+
+    @classmethod
+    def from_arrays(cls, arrays, meta, substitutions, version=None):
+        """Rebuilds an engine around prebuilt (possibly memory-mapped, read-only) arrays."""
+        engine = cls.__new__(cls)
+        engine.version = version
+        engine.substitutions = substitutions
+        engine.size = meta['size']
+        engine.vocab = {ing: i for i, ing in enumerate(meta['vocab'])}
+        for name in cls.ARRAYS:
+            setattr(engine, name, arrays[name])
+        engine.tag_masks = dict(zip(meta['tags'], arrays['tag_masks']))
+        engine.difficulty_masks = dict(zip(meta['difficulties'], arrays['difficulty_masks']))
+        return engine
+
+    @staticmethod
+    def _compress(keys, values, size):
+        order = np.argsort(keys, kind='stable')
+        ptr = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys, minlength=size), out=ptr[1:])
+        return values[order], ptr
+
+    @staticmethod
+    def _gather(data, ptr, ids):
+        if len(ids) == 0:
+            return data[:0]
+        return np.concatenate([data[ptr[i]:ptr[i + 1]] for i in ids])
+
+    def filter_mask(self, dietary=None, difficulty=None, max_time=None):
+        """Intersects the precomputed filter indexes; None means no filter applies."""
+        mask = None
+        if dietary is not None:
+            mask = self.tag_masks.get(dietary, np.zeros(self.size, dtype=bool)).copy()
+        if difficulty is not None:
+            rows = self.difficulty_masks.get(difficulty, np.zeros(self.size, dtype=bool))
+            mask = rows.copy() if mask is None else mask & rows
+        if max_time is not None:
+            rows = np.zeros(self.size, dtype=bool)
+            rows[self.cook_time_order[:np.searchsorted(self.sorted_cook_times, max_time, side='right')]] = True
+            mask = rows if mask is None else mask & rows
+        return mask
+
+    def _credit(self, ids, weights=None, amounts=None, scale=None):
+        """Per recipe, the sum over the ingredients `ids` it uses of their weight (default 1).
+
+        With amounts (per id, inf for unknown) each use only earns the share of the recipe's
+        quantity, scaled per row by `scale`, that the amount covers.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        rows = self._gather(self.postings, self.postings_ptr, ids)
+        if weights is None and amounts is None:
+            return np.bincount(rows, minlength=self.size)
+        uses = self.postings_ptr[ids + 1] - self.postings_ptr[ids]
+        credit = np.repeat(np.asarray(weights if weights is not None else np.ones(len(ids)), dtype=np.float64), uses)
+        if amounts is not None:
+            needed = self._gather(self.posting_quantities, self.postings_ptr, ids)
+            if scale is not None:
+                needed = needed * scale[rows]
+            covered = np.ones(len(rows), dtype=np.float64)
+            np.divide(np.repeat(np.asarray(amounts, dtype=np.float64), uses), needed, out=covered, where=needed > 0)
+            credit *= np.minimum(covered, 1.0)
+        return np.bincount(rows, weights=credit, minlength=self.size)
+
+    def score(self, user_ingredients, quantities=False, servings=None):
+        """Returns the match score of every recipe, aligned with self.recipes.
+
+        user_ingredients is a Pantry, or any iterable of names to build one from. With
+        quantities=True a match only earns the share of the recipe's quantity the pantry's
+        amount covers, recipes scaled to `servings` if given; ingredients the pantry has no
+        amount for count as covered.
+        """
+        if not isinstance(user_ingredients, Pantry):
+            user_ingredients = Pantry(user_ingredients, self.substitutions)
+        have = [c for c in user_ingredients.names if c in self.vocab]
+        subs = [(required, sub, confidence) for required, (sub, confidence) in user_ingredients.substitutes.items()
+                if required in self.vocab]
+        scale = servings / self.servings if quantities and servings else None
+
+        amounts = user_ingredients.amounts
+        perfect = self._credit([self.vocab[c] for c in have],
+                               amounts=[amounts.get(c, np.inf) for c in have] if quantities else None, scale=scale)
+        # Each substituted ingredient credits the recipes using it with its substitute's confidence
+        substituted = self._credit([self.vocab[required] for required, _, _ in subs],
+                                   weights=[confidence for _, _, confidence in subs],
+                                   amounts=[amounts.get(sub, np.inf) for _, sub, _ in subs] if quantities else None,
+                                   scale=scale)
+
+        scores = np.zeros(self.size, dtype=np.float64)
+        np.divide(perfect + substituted, self.lengths, out=scores, where=self.lengths > 0)
+        return scores
+
+    def scale(self, rows, servings):
+        """Per-row factors from each recipe's own servings to `servings`; nutrition is per serving and never scaled."""
+        return servings / self.servings[rows]
+
+    def rank(self, user_ingredients, mask=None, limit=10, offset=0, quantities=False, servings=None):
+        """Rows offset..offset+limit of the ranking, best first, ties kept in catalog order.
+
+        Also returns the total number of recipes scoring above MIN_SCORE. Only the
+        requested window is sorted; the rest is cut off with a linear-time partition.
+        """
+        scores = self.score(user_ingredients, quantities, servings)
+        if mask is not None:
+            scores[~mask] = 0
+        hits = np.flatnonzero(scores > MIN_SCORE)
+        total = len(hits)
+
+        k = offset + limit
+        if k <= 0 or offset >= total:
+            return hits[:0], scores[:0], total
+        # Equal scores summed in a different order can differ in the last bit; rounded, they tie
+        hit_scores = np.round(scores[hits], 9)
+        if k < total:
+            cutoff = hit_scores[np.argpartition(-hit_scores, k - 1)[:k]].min()
+            # Keep every tie at the cutoff so catalog order decides between them
+            keep = hit_scores >= cutoff
+            hits, hit_scores = hits[keep], hit_scores[keep]
+        hits = hits[np.argsort(-hit_scores, kind='stable')][offset:k]
+        return hits, scores[hits], total
+
+_engine = None
+
+def get_engine():
+    global _engine
+    if _engine is None or _engine.version != models.catalog_version:
+        snapshot = models.recipe_store.pristine_snapshot
+        if snapshot is not None and snapshot.engine_matches():
+            # The store still matches its on-disk snapshot, so map the prebuilt arrays
+            arrays, meta = snapshot.engine_arrays()
+            _engine = ScoringEngine.from_arrays(arrays, meta, models.substitution_graph, models.catalog_version)
+        else:
+            _engine = ScoringEngine(models.recipe_store.values(), models.substitution_graph, models.catalog_version)
+    return _engine
@@ -0,0 +1,111 @@
+import gc
+import logging
+import threading
+import time
+from . import models
+
+# What an app does before serving: load the catalog, check the database schema and run the
+# warm-up hooks. CATALOG_LOAD=eager does all of it inside create_app, so under a preforking
+# server (see gunicorn.conf.py) it happens once in the master and workers share the result
+# copy-on-write; CATALOG_LOAD=lazy defers it to the first request. DATABASE_INIT=cli leaves
+# the schema to a one-off `flask database init` instead of checking it on every start.
+logger = logging.getLogger(__name__)
+
+WARMUPS = {}
+_state = {'loaded': False}
+_lock = threading.Lock()
+
+def warmup_hook(name):
+    """Registers fn(app) as the warm-up WARMUP=<name> runs once the catalog is loaded."""
+    def register(fn):
+        WARMUPS[name] = fn
+        return fn
+    return register
+
+@warmup_hook('scoring')
+def _warm_scoring(app):
+    # Compiles the engine and runs one ranking, so the first /generate pays for neither
+    from .scoring import get_engine
+    from .substitutions import Pantry
+    engine = get_engine()
+    engine.rank(Pantry(models.all_ingredients[:5], engine.substitutions), limit=1)
+
+@warmup_hook('autocomplete')
+def _warm_autocomplete(app):
+    from .autocomplete import get_index
+    get_index().complete('a', 1)
+
+@warmup_hook('results')
+def _warm_results(app):
+    # Names the result cache's namespace; snapshots older than the recorded digest are hashed here
+    from . import results
+    results.cache.namespace()
+
+@warmup_hook('payloads')
+def _warm_payloads(app):
+    from . import payloads
+    payloads.warm()
+
+@warmup_hook('recognition')
+def _warm_recognition(app):
+    from . import recognition
+    recognition.recognizer.backend.warm()
+
+def warm(app, names):
+    for name in names:
+        hook = WARMUPS.get(name)
+        if hook is None:
+            logger.warning("Unknown warm-up %r (known: %s)", name, ', '.join(sorted(WARMUPS)))
+            continue
+        start = time.perf_counter()
+        try:
+            hook(app)
+        except Exception:
+            # A warm-up only saves time later; the request that needs the work will do it
+            logger.exception("Warm-up %r failed", name)
+            continue
+        logger.info("Warm-up %r took %.3fs", name, time.perf_counter() - start)
+
+def init_database(app):
+    """Creates missing tables, brings existing ones up to date and backfills derived rows."""
+    from . import db, ratings
+    from .database import upgrade
+    db.create_all()
+    created = upgrade()
+    ratings.backfill_stats()
+    return created
+
+def load(app):
+    """Loads the catalog, checks the schema (DATABASE_INIT=startup) and warms up; once per process tree."""
+    if _state['loaded']:
+        return
+    with _lock:
+        if _state['loaded']:
+            return
+        start = time.perf_counter()
+        with app.app_context():
+            models.init_data(app.config['CATALOG_SNAPSHOT'], app.config['CATALOG_SEED'])
+            if app.config['DATABASE_INIT'] == 'startup':
+                init_database(app)
+            warm(app, app.config['WARMUP'])
+        _state['loaded'] = True
+        logger.info("Loaded %d recipes in %.3fs", len(models.recipe_store), time.perf_counter() - start)
+
+def init_app(app):
+    # Every new app loads its own catalog, even in a process that already built one
+    _state['loaded'] = False
+    if app.config['CATALOG_LOAD'] == 'lazy':
+        app.before_request(lambda: load(app))
+    else:
+        load(app)
+
+def before_fork():
+    # Objects built so far are never freed in the workers; keeping the collector off them
+    # stops it from touching (and so copying) the shared pages
+    gc.freeze()
+
+def after_fork(app):
+    # Connections opened in the master must not be shared with the workers
+    from . import db
+    with app.app_context():
+        db.engine.dispose(close=False)
@@ -0,0 +1,104 @@
+from .canonical import canonical_name
+
+# Substitutions form a directed graph: an edge required -> substitute says the substitute can
+# stand in for the required ingredient, and its confidence (0..1] is the share of a perfect
+# match the recipe is credited with. With max_hops > 1 chains are followed as well
+# ("pasta" -> "noodles" -> "rice"); a chain is worth the product of its edges.
+DEFAULT_CONFIDENCE = 0.7
+DEFAULT_MAX_HOPS = 1
+# Chains weaker than this are dropped; direct edges always count
+MIN_CONFIDENCE = 0.3
+
+def edges(substitution_map):
+    """(required, substitute, confidence) triples in canonical form, in map order.
+
+    Substitutes are either plain names (DEFAULT_CONFIDENCE) or (name, confidence) pairs.
+    """
+    for required, subs in substitution_map.items():
+        for sub in subs:
+            name, confidence = (sub, DEFAULT_CONFIDENCE) if isinstance(sub, str) else sub
+            yield canonical_name(required), canonical_name(name), float(confidence)
+
+class SubstitutionGraph:
+    """SUBSTITUTION_MAP compiled once: every substitute reachable from an ingredient within max_hops,
+    at its best chain confidence, strongest first (ties keep the map's order, direct edges first).
+
+    `sources` inverts that, so the best substitute for everything a pantry lacks is found by
+    walking only the pantry's own edges, whatever the size of the table.
+    """
+
+    def __init__(self, substitution_map, max_hops=DEFAULT_MAX_HOPS, min_confidence=MIN_CONFIDENCE):
+        self.max_hops = max_hops
+        self.min_confidence = min_confidence
+        adjacency = {}
+        for required, sub, confidence in edges(substitution_map):
+            if sub != required:
+                row = adjacency.setdefault(required, {})
+                row[sub] = max(confidence, row.get(sub, 0.0))
+
+        self.targets = {}
+        for required in adjacency:
+            best = {}
+            frontier = {required: 1.0}
+            # Bounded Bellman-Ford on products: only substitutes whose confidence improved are expanded again
+            for hop in range(max_hops):
+                reached = {}
+                for node, confidence in frontier.items():
+                    for sub, edge in adjacency.get(node, {}).items():
+                        chained = confidence * edge
+                        if sub == required or (hop and chained < min_confidence):
+                            continue
+                        if chained > reached.get(sub, 0.0):
+                            reached[sub] = chained
+                frontier = {}
+                for sub, chained in reached.items():
+                    if sub not in best or chained > best[sub][0]:
+                        best[sub] = (chained, best[sub][1] if sub in best else len(best))
+                        frontier[sub] = chained
+            ranked = sorted(best.items(), key=lambda item: (-item[1][0], item[1][1]))
+            self.targets[required] = [(sub, confidence) for sub, (confidence, _) in ranked]
+
+        self.sources = {}
+        for required, subs in self.targets.items():
+            for position, (sub, confidence) in enumerate(subs):
+                self.sources.setdefault(sub, []).append((required, confidence, position))
+
+    def best_substitutes(self, pantry):
+        """required -> (substitute, confidence) for every ingredient the pantry lacks but can stand in for.
+
+        pantry holds canonical names.
+        """
+        best = {}
+        for available in pantry:
+            for required, confidence, position in self.sources.get(available, ()):
+                if required in pantry:
+                    continue
+                current = best.get(required)
+                if current is None or position < current[2]:
+                    best[required] = (available, confidence, position)
+        return {required: (sub, confidence) for required, (sub, confidence, _) in best.items()}
+
+def _amount(quantity):
+    # Only positive numbers are amounts; anything else means "unknown", which counts as plenty
+    if isinstance(quantity, bool) or not isinstance(quantity, (int, float)) or not 0 < quantity < float('inf'):
+        return None
+    return float(quantity)
+
+class Pantry:
+    """A user's ingredients by canonical name (keeping their own spelling) and the best substitute
+    for everything they lack; built once per request and shared by every recipe scored against it.
+
+    Given a name -> quantity mapping, `amounts` keeps the positive quantities by canonical name.
+    """
+
+    def __init__(self, user_ingredients, graph):
+        self.names = {}
+        self.amounts = {}
+        quantities = user_ingredients if isinstance(user_ingredients, dict) else {}
+        for ing in user_ingredients:
+            canonical = canonical_name(ing)
+            self.names.setdefault(canonical, ing)
+            amount = _amount(quantities.get(ing))
+            if amount is not None:
+                self.amounts[canonical] = self.amounts.get(canonical, 0.0) + amount
+        self.substitutes = graph.best_substitutes(self.names)
@@ -0,0 +1,189 @@
+import heapq
+import logging
+import os
+import threading
+import time
+import numpy as np
+from flask import current_app
+from .models import RecipeRating, db
+
+logger = logging.getLogger(__name__)
+
+# A rating at or above this counts as the user liking the recipe
+LIKE_THRESHOLD = 3
+# Upper bound on co-occurrence pairs materialized at once during a rebuild
+PAIR_BUDGET = 5_000_000
+
+class CooccurrenceModel:
+    """Item-item co-occurrence model: for each recipe, the recipes most often liked by the same users.
+
+    A full rebuild keeps the top `neighbors` co-liked recipes per recipe. Rating writes
+    then adjust those counts in place until the next rebuild resynchronizes with the
+    database (which also picks up writes handled by other worker processes).
+    """
+
+    def __init__(self, neighbors=50, max_user_likes=200):
+        self.neighbors = neighbors
+        self.max_user_likes = max_user_likes
+        self.built_at = None
+        self._rows = {}
+        self._lock = threading.Lock()
+
+    def rebuild(self, likes):
+        """likes: (user_id, recipe_name) pairs, grouped by user, most relevant first within a user."""
+        names, name_ids, users, items = [], {}, [], []
+        for user_id, recipe_name in likes:
+            item = name_ids.get(recipe_name)
+            if item is None:
+                item = name_ids[recipe_name] = len(names)
+                names.append(recipe_name)
+            users.append(user_id)
+            items.append(item)
+
+        rows = {}
+        for a, b, count in self._top_pairs(np.asarray(users, dtype=np.int64), np.asarray(items, dtype=np.int64), len(names)):
+            rows.setdefault(names[a], {})[names[b]] = count
+        with self._lock:
+            self._rows = rows
+            self.built_at = time.time()
+
+    def _top_pairs(self, users, items, n_items):
+        if len(users) == 0:
+            return []
+        order = np.argsort(users, kind='stable')
+        users, items = users[order], items[order]
+
+        # Cap each user's contribution so a handful of prolific raters cannot dominate (or blow up) the pair count
+        starts = np.flatnonzero(np.r_[True, users[1:] != users[:-1]])
+        sizes = np.diff(np.r_[starts, len(users)])
+        rank = np.arange(len(users)) - np.repeat(starts, sizes)
+        items = items[rank < self.max_user_likes]
+        sizes = np.minimum(sizes, self.max_user_likes)
+        starts = np.r_[0, np.cumsum(sizes)[:-1]]
+
+        # Every ordered pair of distinct recipes liked by the same user, counted in bounded chunks
+        keys, counts = [], []
+        pair_sizes = sizes * sizes
+        chunk_start = 0
+        while chunk_start < len(sizes):
+            chunk_end = chunk_start + max(1, int(np.searchsorted(
+                np.cumsum(pair_sizes[chunk_start:]), PAIR_BUDGET, side='right')))
+            m = np.repeat(sizes[chunk_start:chunk_end], pair_sizes[chunk_start:chunk_end])
+            base = np.repeat(starts[chunk_start:chunk_end], pair_sizes[chunk_start:chunk_end])
+            pair_starts = np.r_[0, np.cumsum(pair_sizes[chunk_start:chunk_end])[:-1]]
+            offset = np.arange(len(m)) - np.repeat(pair_starts, pair_sizes[chunk_start:chunk_end])
+            a, b = items[base + offset // m], items[base + offset % m]
+            chunk_keys, chunk_counts = np.unique((a * n_items + b)[a != b], return_counts=True)
+            keys.append(chunk_keys)
+            counts.append(chunk_counts)
+            chunk_start = chunk_end
+
+        keys, inverse = np.unique(np.concatenate(keys), return_inverse=True)
+        counts = np.bincount(inverse, weights=np.concatenate(counts)).astype(np.int64)
+        a, b = keys // n_items, keys % n_items
+
+        # Keep the strongest `neighbors` per recipe
+        order = np.lexsort((b, -counts, a))
+        a, b, counts = a[order], b[order], counts[order]
+        group_starts = np.flatnonzero(np.r_[True, a[1:] != a[:-1]])
+        rank = np.arange(len(a)) - np.repeat(group_starts, np.diff(np.r_[group_starts, len(a)]))
+        keep = rank < self.neighbors
+        return zip(a[keep].tolist(), b[keep].tolist(), counts[keep].tolist())
+
+    def record_like_change(self, user_likes, recipe_name, liked):
+        """Applies one user starting (or ceasing) to like recipe_name, given their other liked recipes."""
+        delta = 1 if liked else -1
+        with self._lock:
+            for other in user_likes:
+                if other == recipe_name:
+                    continue
+                for a, b in ((other, recipe_name), (recipe_name, other)):
+                    row = self._rows.setdefault(a, {})
+                    count = row.get(b, 0) + delta
+                    if count > 0:
+                        row[b] = count
+                    else:
+                        row.pop(b, None)
+
+    def suggest(self, user_likes, k=5):
+        scores = {}
+        with self._lock:
+            for liked in user_likes:
+                for other, count in self._rows.get(liked, {}).items():
+                    if other not in user_likes:
+                        scores[other] = scores.get(other, 0) + count
+        return [name for name, _ in heapq.nsmallest(k, scores.items(), key=lambda item: (-item[1], item[0]))]
+
+model = CooccurrenceModel()
+_refresher = {'pid': None}
+_refresher_lock = threading.Lock()
+
+def user_likes(user_id):
+    return {r.recipe_name for r in RecipeRating.query.filter(
+        RecipeRating.user_id == user_id, RecipeRating.rating >= LIKE_THRESHOLD
+    ).all()}
+
+def _liked(rating):
+    try:
+        return rating is not None and int(rating) >= LIKE_THRESHOLD
+    except (TypeError, ValueError):
+        return False
+
+def record_ratings(user_id, changes):
+    """Folds committed rating writes, (recipe_name, old_rating, new_rating) each, into the live model.
+
+    Only like/unlike transitions matter. They are replayed one at a time against the
+    user's likes as they stood before the batch, so pairs within a batch count once.
+    """
+    if _refresher['pid'] != os.getpid():
+        return
+    changes = [(name, _liked(new)) for name, old, new in changes if _liked(new) != _liked(old)]
+    if not changes:
+        return
+    likes = user_likes(user_id)
+    for name, liked in changes:
+        if liked:
+            likes.discard(name)
+        else:
+            likes.add(name)
+    for name, liked in changes:
+        if liked:
+            model.record_like_change(likes, name, True)
+            likes.add(name)
+        else:
+            likes.discard(name)
+            model.record_like_change(likes, name, False)
+
+def record_rating(user_id, recipe_name, old_rating, new_rating):
+    record_ratings(user_id, [(recipe_name, old_rating, new_rating)])
+
+def refresh_model():
+    likes = db.session.query(RecipeRating.user_id, RecipeRating.recipe_name).filter(
+        RecipeRating.rating >= LIKE_THRESHOLD
+    ).order_by(RecipeRating.user_id, RecipeRating.id.desc()).all()
+    model.rebuild(likes)
+
+def _refresh_loop(app, interval):
+    while True:
+        time.sleep(interval)
+        with app.app_context():
+            try:
+                refresh_model()
+            except Exception:
+                logger.exception("Suggestion model refresh failed")
+            finally:
+                db.session.remove()
+
+def get_model():
+    """The process-wide model, built on first use and then refreshed in the background."""
+    if _refresher['pid'] != os.getpid():
+        with _refresher_lock:
+            if _refresher['pid'] != os.getpid():
+                model.neighbors = current_app.config.get('SUGGESTIONS_NEIGHBORS', model.neighbors)
+                refresh_model()
+                interval = current_app.config.get('SUGGESTIONS_REFRESH_SECONDS', 300)
+                if interval > 0:
+                    threading.Thread(target=_refresh_loop, args=(current_app._get_current_object(), interval),
+                                     name='suggestions-refresh', daemon=True).start()
+                _refresher['pid'] = os.getpid()
+    return model
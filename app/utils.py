@@ -1,8 +1,101 @@
+from collections import OrderedDict, namedtuple
 from functools import wraps
+import threading
+import time
 from flask import request, jsonify, current_app
 # UPDATED: Import 'decode' directly from the jwt library
 import jwt
-from .models import UserProfile
+from sqlalchemy import event, inspect
+from .models import UserProfile, db
+from . import passwords
+from .metrics import stage
+
+# What token_required hands to routes: the verified identity, not a live ORM row
+AuthenticatedUser = namedtuple('AuthenticatedUser', ['id', 'name', 'email'])
+
+class TokenCache:
+    """Bounded LRU of verified token -> AuthenticatedUser, each entry capped by a TTL and the token's exp."""
+
+    def __init__(self, maxsize=10000, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, maxsize, ttl):
+        with self._lock:
+            self.maxsize, self.ttl = maxsize, ttl
+            self._entries.clear()
+
+    def get(self, token):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._entries[token]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, token, user, token_exp=None):
+        if self.maxsize <= 0:
+            return
+        expires_at = time.time() + self.ttl
+        if token_exp is not None:
+            expires_at = min(expires_at, token_exp)
+        with self._lock:
+            self._entries[token] = (user, expires_at)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for token in [t for t, (user, _) in self._entries.items() if user.id == user_id]:
+                del self._entries[token]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'size': len(self._entries)
+            }
+
+token_cache = TokenCache()
+
+@event.listens_for(UserProfile, 'after_delete')
+def _evict_deleted_user(mapper, connection, target):
+    token_cache.invalidate_user(target.id)
+
+@event.listens_for(UserProfile, 'after_update')
+def _evict_on_password_change(mapper, connection, target):
+    if inspect(target).attrs.password_hash.history.has_changes():
+        token_cache.invalidate_user(target.id)
+
+def _load_user(data):
+    # Tokens issued before user_id was added to the claims fall back to the email lookup
+    if 'user_id' in data:
+        user = db.session.get(UserProfile, data['user_id'])
+        if user and user.email != data['email']:
+            user = None
+    else:
+        user = UserProfile.query.filter_by(email=data['email']).first()
+    # A token outlives its password only until the fingerprint stops matching
+    if user and data.get('pwd') != passwords.fingerprint(user.password_hash):
+        user = None
+    return AuthenticatedUser(user.id, user.name, user.email) if user else None
 
 def token_required(f):
     @wraps(f)
@@ -10,18 +103,22 @@ def token_required(f):
         token = None
         if 'Authorization' in request.headers:
             token = request.headers['Authorization'].split(" ")[1]
-        
+
         if not token:
             return jsonify({'message': 'Token is missing!'}), 401
-        
-        try:
-            # This line now works correctly because of the updated import
-            data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=["HS256"])
-            current_user = UserProfile.query.filter_by(email=data['email']).first()
-            if not current_user:
-                return jsonify({'message': 'User not found!'}), 401
-        except Exception as e:
-            return jsonify({'message': f'Token is invalid or expired! {e}'}), 401
-        
+
+        with stage('auth'):
+            current_user = token_cache.get(token)
+            if current_user is None:
+                try:
+                    # This line now works correctly because of the updated import
+                    data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=["HS256"])
+                    current_user = _load_user(data)
+                    if not current_user:
+                        return jsonify({'message': 'User not found!'}), 401
+                except Exception as e:
+                    return jsonify({'message': f'Token is invalid or expired! {e}'}), 401
+                token_cache.put(token, current_user, data.get('exp'))
+
         return f(current_user, *args, **kwargs)
     return decorated
@@ -0,0 +1,55 @@
+"""Times IngredientIndex prefix and typo-tolerant lookups on a synthetic vocabulary.
+
+Usage: python benchmarks/bench_autocomplete.py [n_ingredients]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.autocomplete import IngredientIndex
+
+def synthetic_vocabulary(n, seed=42):
+    rnd = random.Random(seed)
+    # Letter frequencies roughly like English, so trigram postings have realistic lengths
+    letters = 'eeeeeaaaaiiioooonnnrrrsssttllcdumphgbfywkvxzjq'
+    words = list({''.join(rnd.choices(letters, k=rnd.randint(3, 9))) for _ in range(n // 2)})
+    terms = list(dict.fromkeys(' '.join(rnd.sample(words, rnd.randint(1, 3))) for _ in range(n)))
+    return terms, [rnd.randint(0, 500) for _ in terms]
+
+def per_call_us(fn, queries):
+    for query in queries[:50]:
+        fn(query)
+    start = time.perf_counter()
+    for query in queries:
+        fn(query)
+    return (time.perf_counter() - start) / len(queries) * 1e6
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 60000
+    rnd = random.Random(7)
+    terms, popularity = synthetic_vocabulary(n)
+
+    start = time.perf_counter()
+    index = IngredientIndex(terms, popularity)
+    print(f"{len(terms)} ingredients, index built in {time.perf_counter() - start:.2f}s")
+
+    prefixes = [rnd.choice(terms)[:rnd.randint(1, 8)] for _ in range(3000)]
+    originals, typos = [], []
+    for _ in range(1000):
+        original = rnd.choice(terms)
+        term = list(original)
+        term[rnd.randrange(len(term))] = 'x'
+        originals.append(original)
+        typos.append(''.join(term))
+    recovered = sum(original in index.complete(typo) for original, typo in zip(originals, typos))
+
+    print(f"prefix lookup:       {per_call_us(lambda q: index.prefix(q, 10), prefixes):8.1f} us")
+    print(f"complete (prefix):   {per_call_us(lambda q: index.complete(q, 10), prefixes):8.1f} us")
+    print(f"complete (typo):     {per_call_us(lambda q: index.complete(q, 10), typos):8.1f} us")
+    print(f"typos completing to the intended ingredient: {recovered}/{len(typos)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""Reports password verifications (logins) per second for each bcrypt cost factor.
+
+Usage: python benchmarks/bench_login.py [costs] [workers] [threads]
+e.g.   python benchmarks/bench_login.py 10,11,12 2 8
+"""
+from concurrent.futures import ThreadPoolExecutor
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import passwords
+
+def logins_per_second(cost, threads, seconds=3.0):
+    password_hash = passwords.hash_password('correct horse battery staple', rounds=cost)
+    deadline = time.perf_counter() + seconds
+
+    def login_loop():
+        done = 0
+        while time.perf_counter() < deadline:
+            try:
+                passwords.check_password(password_hash, 'correct horse battery staple')
+                done += 1
+            except passwords.HashingBusy:
+                pass
+        return done
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        total = sum(executor.map(lambda _: login_loop(), range(threads)))
+    return total / (time.perf_counter() - start)
+
+def main():
+    costs = [int(c) for c in (sys.argv[1] if len(sys.argv) > 1 else '10,11,12').split(',')]
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    threads = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+
+    passwords.configure(workers=workers, max_pending=threads)
+    print(f"{'cost':>4}  {'logins/sec':>10}  (pool workers={workers}, request threads={threads})")
+    for cost in costs:
+        print(f"{cost:>4}  {logins_per_second(cost, threads):>10.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Compares the Python heap held by a catalog of N recipes in three representations:
+
+  legacy    the original dict-per-instance Recipe with dict ingredients and in-memory steps
+  compact   slotted Recipe with interned ingredient ids and array quantities
+  snapshot  compact Recipe decoded from a catalog snapshot; steps/nutrition stay in the
+            shared memory-mapped details blob (reported separately, it is page cache)
+
+Usage: python benchmarks/bench_memory.py [n_recipes]
+"""
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import models
+from app.models import Recipe
+from datagen import synthetic_records
+
+class LegacyRecipe:
+    def __init__(self, name, ingredients, steps, nutrition, difficulty, cook_time, cuisine, image_url, reviews, tags, servings):
+        self.name = name
+        self.ingredients = {k.lower(): float(v) for k, v in ingredients.items()}
+        self.steps = steps
+        self.nutrition = nutrition
+        self.difficulty = difficulty
+        self.cook_time = cook_time
+        self.cuisine = cuisine
+        self.image_url = image_url
+        self.reviews = reviews
+        self.tags = tags
+        self.servings = servings
+
+def heap_delta(build):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return after - before
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    records, _, _ = synthetic_records(n)
+    # Decode from JSON inside the measurement, as a load from disk would, so no strings are shared with `records`
+    encoded = [json.dumps(r) for r in records]
+
+    legacy = heap_delta(lambda: {r.name: r for r in (LegacyRecipe(**json.loads(s)) for s in encoded)})
+    compact = heap_delta(lambda: {r.name: r for r in (Recipe(**json.loads(s)) for s in encoded)})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot_path = os.path.join(tmp, 'catalog')
+        models.build_catalog(records, snapshot_path)
+        models.load_catalog(snapshot_path)
+        snapshot = heap_delta(lambda: list(models.recipe_store.values()))
+        details_size = os.path.getsize(os.path.join(snapshot_path, 'details.bin'))
+
+    print(f"{n} recipes, Python heap:")
+    for label, size in (('legacy', legacy), ('compact', compact), ('snapshot', snapshot)):
+        print(f"  {label:<9} {size / 2**20:8.1f} MiB  ({size / n:6.0f} B/recipe)")
+    print(f"  shared details blob (mmap, not per worker): {details_size / 2**20:.1f} MiB")
+
+if __name__ == '__main__':
+    main()
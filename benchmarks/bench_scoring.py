@@ -0,0 +1,81 @@
+"""Times ScoringEngine on a synthetic catalog and checks it against calculate_match_score.
+
+The catalog's substitution table is extended with random weighted edges, followed up to
+two hops, to show scoring stays flat as the table grows.
+
+Usage: python benchmarks/bench_scoring.py [n_recipes] [n_substitution_edges]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.models import SUBSTITUTION_MAP
+from app.substitutions import SubstitutionGraph, Pantry
+from app.recipes import calculate_match_score
+from app.scoring import ScoringEngine, MIN_SCORE
+from datagen import synthetic_recipes, synthetic_pantries
+
+def synthetic_substitutions(vocab, n_edges, seed=42):
+    rnd = random.Random(seed)
+    table = {required: list(subs) for required, subs in SUBSTITUTION_MAP.items()}
+    for _ in range(n_edges):
+        required, sub = rnd.sample(vocab, 2)
+        table.setdefault(required, []).append((sub, round(rnd.uniform(0.3, 0.95), 2)))
+    return table
+
+def median_p95_ms(timings):
+    timings = sorted(timings)
+    return timings[len(timings) // 2] * 1000, timings[int(len(timings) * 0.95)] * 1000
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    n_edges = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    recipes, vocab, weights = synthetic_recipes(n)
+    rnd = random.Random(7)
+    pantries = synthetic_pantries(vocab, weights, 50)
+
+    start = time.perf_counter()
+    graph = SubstitutionGraph(synthetic_substitutions(vocab, n_edges), max_hops=2)
+    print(f"substitutions: {n_edges} extra edges, {sum(map(len, graph.targets.values()))} after 2 hops, "
+          f"compiled in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    start = time.perf_counter()
+    engine = ScoringEngine(recipes, graph)
+    print(f"build: {(time.perf_counter() - start) * 1000:.1f} ms for {n} recipes")
+
+    prepare, timings = [], []
+    for pantry in pantries:
+        start = time.perf_counter()
+        prepared = Pantry(pantry, graph)
+        prepare.append(time.perf_counter() - start)
+        engine.score(prepared)
+        timings.append(time.perf_counter() - start)
+    print("best substitutes per request: median %.3f ms, p95 %.3f ms" % median_p95_ms(prepare))
+    print("score (including them):       median %.3f ms, p95 %.3f ms" % median_p95_ms(timings))
+
+    timings = []
+    for pantry in pantries:
+        prepared = Pantry({ing: rnd.choice([None, rnd.randint(1, 300)]) for ing in pantry}, graph)
+        start = time.perf_counter()
+        engine.score(prepared, quantities=True, servings=4)
+        timings.append(time.perf_counter() - start)
+    print("score with quantities, 4 servings: median %.3f ms, p95 %.3f ms" % median_p95_ms(timings))
+
+    mismatches = 0
+    for pantry in pantries[:5]:
+        prepared = Pantry(pantry, graph)
+        scores = engine.score(prepared)
+        for row, recipe in enumerate(recipes):
+            expected, _ = calculate_match_score(recipe.ingredients.keys(), prepared)
+            # Confidences are summed in a different order, so allow for rounding
+            if abs(expected - scores[row]) > 1e-9 or (expected > MIN_SCORE) != (scores[row] > MIN_SCORE):
+                mismatches += 1
+    print(f"parity: {mismatches} mismatches over {5 * n} recipe/pantry pairs")
+    return 1 if mismatches else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
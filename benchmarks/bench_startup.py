@@ -0,0 +1,100 @@
+"""Times app startup and first requests under each startup mode (see app/startup.py).
+
+Each run is a fresh interpreter, as a server process would be: it reports the time to import
+the app package, to run create_app, and then the first login, the first two /generate calls
+(different pantries, so neither is a result-cache hit) and the first /all. The first run
+builds the catalog snapshot and database every other run then starts from.
+
+Usage: python benchmarks/bench_startup.py [n_recipes] [repeats]
+e.g.   python benchmarks/bench_startup.py 20000 5
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+ALL_WARMUPS = 'scoring,autocomplete,results,payloads,recognition'
+MODES = [
+    ('eager (default)', {}),
+    ('eager, no warm-ups', {'WARMUP': ''}),
+    ('eager, all warm-ups', {'WARMUP': ALL_WARMUPS}),
+    ('eager, DATABASE_INIT=cli', {'DATABASE_INIT': 'cli'}),
+    ('lazy, DATABASE_INIT=cli', {'CATALOG_LOAD': 'lazy', 'DATABASE_INIT': 'cli'})
+]
+COLUMNS = ['process', 'import', 'create_app', 'first_login', 'generate_1', 'generate_2', 'all']
+
+def child(tmp, prepare):
+    """One server start; prints its timings as JSON."""
+    timings = {}
+    start = time.perf_counter()
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from app import create_app
+    timings['import'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    app = create_app()
+    timings['create_app'] = time.perf_counter() - start
+
+    client = app.test_client()
+    login = {'email': 'bench@example.com', 'password': 'correct horse battery staple'}
+    if prepare:
+        client.post('/api/auth/register', json=dict(login, name='bench'))
+
+    def timed(name, fn):
+        start = time.perf_counter()
+        response = fn()
+        timings[name] = time.perf_counter() - start
+        if response.status_code != 200:
+            raise RuntimeError(f"{name}: HTTP {response.status_code}")
+        return response
+
+    token = timed('first_login', lambda: client.post('/api/auth/login', json=login)).get_json()['token']
+    headers = {'Authorization': f"Bearer {token}"}
+    with open(os.path.join(tmp, 'pantries.json'), encoding='utf-8') as f:
+        pantries = json.load(f)
+    for i, pantry in enumerate(pantries[:2], 1):
+        timed(f"generate_{i}", lambda: client.post('/api/generate', json={'ingredients': pantry}, headers=headers))
+    timed('all', lambda: client.get('/api/all', headers=headers))
+    print(json.dumps(timings))
+
+def run(tmp, env, prepare=False):
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', tmp] + (['--prepare'] if prepare else []),
+                            env=env, capture_output=True, text=True, check=True).stdout
+    timings = json.loads(output.strip().splitlines()[-1])
+    timings['process'] = time.perf_counter() - start
+    return timings
+
+def row(label, timings):
+    return f"{label:<28}" + ''.join(f"{timings[column] * 1000:>12.1f}" for column in COLUMNS)
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == '--child':
+        return child(sys.argv[2], '--prepare' in sys.argv)
+
+    import datagen
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    with tempfile.TemporaryDirectory() as tmp:
+        records, vocab, weights = datagen.synthetic_records(n)
+        datagen.write_dump(records, os.path.join(tmp, 'recipes.json'))
+        with open(os.path.join(tmp, 'pantries.json'), 'w', encoding='utf-8') as f:
+            json.dump([{ing: 1 for ing in sorted(pantry)} for pantry in datagen.synthetic_pantries(vocab, weights, 2)], f)
+        base = dict(os.environ, DATABASE_URL='sqlite:///' + os.path.join(tmp, 'bench.db'),
+                    CATALOG_SEED=os.path.join(tmp, 'recipes.json'), CATALOG_SNAPSHOT=os.path.join(tmp, 'catalog'),
+                    BCRYPT_LOG_ROUNDS='4', RECOGNITION_BACKEND='stub', SUGGESTIONS_REFRESH_SECONDS='0')
+
+        print(f"{n} recipes, median of {repeats} runs, milliseconds")
+        print(f"{'':<28}" + ''.join(f"{column:>12}" for column in COLUMNS))
+        print(row('first start (builds all)', run(tmp, base, prepare=True)))
+        for label, overrides in MODES:
+            runs = [run(tmp, dict(base, **overrides)) for _ in range(repeats)]
+            print(row(label, {column: statistics.median(r[column] for r in runs) for column in COLUMNS}))
+
+if __name__ == '__main__':
+    main()
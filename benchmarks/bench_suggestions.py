@@ -0,0 +1,72 @@
+"""Compares per-request SQL suggestions with the precomputed co-occurrence model.
+
+Usage: python benchmarks/bench_suggestions.py [n_ratings] [n_users] [n_recipes]
+e.g.   python benchmarks/bench_suggestions.py 1000000 50000 10000
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+from sqlalchemy import func
+from app import db
+from app.models import RecipeRating
+from app import suggestions
+from datagen import synthetic_ratings
+
+def sql_suggestions(user_id, user_high_ratings):
+    # The per-request query pair /suggestions used before the model
+    similar_users = db.session.query(RecipeRating.user_id).filter(
+        RecipeRating.recipe_name.in_(user_high_ratings),
+        RecipeRating.user_id != user_id,
+        RecipeRating.rating >= 3
+    ).distinct().limit(50).all()
+    return [r.recipe_name for r in db.session.query(RecipeRating.recipe_name).filter(
+        RecipeRating.user_id.in_([u.user_id for u in similar_users]),
+        RecipeRating.rating >= 3,
+        ~RecipeRating.recipe_name.in_(user_high_ratings)
+    ).group_by(RecipeRating.recipe_name).order_by(func.count(RecipeRating.user_id).desc()).limit(5).all()]
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    n_ratings = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    n_users = int(sys.argv[2]) if len(sys.argv) > 2 else 50_000
+    n_recipes = int(sys.argv[3]) if len(sys.argv) > 3 else 10_000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:///" + os.path.join(tmp, 'bench.db')
+        app.config['SUGGESTIONS_REFRESH_SECONDS'] = 0
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            rows, elapsed = timed(synthetic_ratings, n_ratings, n_users, [f"recipe {i}" for i in range(n_recipes)])
+            db.session.execute(RecipeRating.__table__.insert(), rows)
+            db.session.commit()
+            print(f"{len(rows)} ratings, {n_users} users, {n_recipes} recipes")
+
+            _, elapsed = timed(suggestions.get_model)
+            print(f"model build (DB load + co-occurrence): {elapsed:.2f}s")
+
+            sample = random.Random(7).sample(range(1, n_users + 1), 200)
+            likes = {user_id: suggestions.user_likes(user_id) for user_id in sample}
+            model = suggestions.get_model()
+
+            _, sql_time = timed(lambda: [sql_suggestions(u, likes[u]) for u in sample[:20]])
+            _, model_time = timed(lambda: [model.suggest(likes[u]) for u in sample])
+            print(f"per request  SQL: {sql_time / 20 * 1000:8.2f} ms   model: {model_time / len(sample) * 1000:8.3f} ms")
+
+            _, update_time = timed(lambda: [suggestions.record_rating(u, 'recipe 0', None, 5) for u in sample])
+            print(f"incremental /rate update (incl. likes query): {update_time / len(sample) * 1000:.3f} ms")
+
+if __name__ == '__main__':
+    main()
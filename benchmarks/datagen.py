@@ -0,0 +1,95 @@
+"""Deterministic synthetic data for the benchmarks: recipes, users, ratings and pantries.
+
+The same arguments and seed always produce the same data, so timings taken on different
+commits are measured against identical inputs. Distributions are skewed the way real
+usage is: a few staple ingredients appear in most recipes, a few recipes collect most
+ratings, a few users do most of the rating, and ratings lean towards 4 and 5 stars.
+"""
+import itertools
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import Recipe, SUBSTITUTION_MAP
+from app.substitutions import edges
+
+PASSWORD = 'correct horse battery staple'
+# Share of 1..5 star ratings
+STAR_WEIGHTS = (0.05, 0.08, 0.17, 0.35, 0.35)
+
+def synthetic_records(n, n_ingredients=2000, seed=42):
+    """n recipe records (catalog.RECORD_FIELDS), plus the ingredient vocabulary and its popularity weights."""
+    rnd = random.Random(seed)
+    vocab = sorted({name for required, sub, _ in edges(SUBSTITUTION_MAP) for name in (required, sub)})
+    vocab += [f"ingredient {i}" for i in range(n_ingredients - len(vocab))]
+    # Popularity falls off with rank, like real pantry staples vs. specialty items
+    weights = [1 / (rank + 1) for rank in range(len(vocab))]
+    records = []
+    for i in range(n):
+        ings = set(rnd.choices(vocab, weights=weights, k=rnd.randint(3, 10)))
+        records.append({
+            'name': f"recipe {i}",
+            'ingredients': {ing: rnd.choice([1, 2, 50, 100, 200]) for ing in ings},
+            'steps': [f"Step {s + 1}: " + "combine, stir and cook until done. " * rnd.randint(2, 5)
+                      for s in range(rnd.randint(4, 8))],
+            'nutrition': {"calories": rnd.randint(100, 900), "protein": rnd.randint(2, 50),
+                          "carbs": rnd.randint(2, 90), "fat": rnd.randint(2, 45)},
+            'difficulty': rnd.choice(["Easy", "Medium", "Hard"]),
+            'cook_time': rnd.choice([5, 10, 15, 20, 25, 30, 45, 60, 90]),
+            'cuisine': rnd.choice(["Italian", "Indian", "Mexican", "Chinese", "American", "Universal"]),
+            'image_url': f"https://example.com/img/{i}.jpg",
+            'reviews': [],
+            'tags': rnd.sample(["veg", "gluten-free"], rnd.randint(0, 2)),
+            'servings': rnd.randint(1, 6)
+        })
+    return records, vocab, weights
+
+def synthetic_recipes(n, n_ingredients=2000, seed=42):
+    records, vocab, weights = synthetic_records(n, n_ingredients, seed)
+    return [Recipe(**record) for record in records], vocab, weights
+
+def synthetic_pantries(vocab, weights, n, seed=7, pool=200):
+    """n pantries of 3-12 ingredients drawn by popularity from the `pool` most common ones."""
+    rnd = random.Random(seed)
+    return [set(rnd.choices(vocab[:pool], weights=weights[:pool], k=rnd.randint(3, 12))) for _ in range(n)]
+
+def synthetic_users(n):
+    """Users 1..n, in insertion order, all with PASSWORD."""
+    return [{'name': f"user {i}", 'email': f"user{i}@example.com"} for i in range(1, n + 1)]
+
+def synthetic_ratings(n_ratings, n_users, recipe_names, seed=42):
+    """About n_ratings rating rows for user ids 1..n_users, at most one per user and recipe."""
+    rnd = random.Random(seed)
+    # A few recipes collect most of the ratings...
+    popularity = list(itertools.accumulate(1 / (rank + 1) ** 0.8 for rank in range(len(recipe_names))))
+    # ...and a few users do most of the rating
+    activity = [rnd.lognormvariate(0, 1) for _ in range(n_users)]
+    scale = n_ratings / sum(activity)
+    rows = []
+    for user_id, weight in enumerate(activity, 1):
+        k = min(len(recipe_names), max(1, round(weight * scale)))
+        for recipe in sorted(set(rnd.choices(range(len(recipe_names)), cum_weights=popularity, k=k))):
+            rating = rnd.choices(range(1, 6), weights=STAR_WEIGHTS)[0]
+            rows.append({'user_id': user_id, 'recipe_name': recipe_names[recipe], 'rating': rating})
+    return rows
+
+def write_dump(records, path):
+    """Writes records as a JSON dump that CATALOG_SEED or `flask catalog import` can read."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(records, f)
+
+def populate(users, ratings, password_hash):
+    """Bulk-inserts users (sharing one password hash) and ratings, then derives the rating stats.
+
+    Runs inside an app context. Rows go in through table inserts, without ORM events, so the
+    rating aggregates are filled in afterwards the way they are for an existing database.
+    """
+    from app import db, ratings as rating_stats
+    from app.models import UserProfile, RecipeRating
+    db.session.execute(UserProfile.__table__.insert(), [dict(user, password_hash=password_hash) for user in users])
+    db.session.execute(RecipeRating.__table__.insert(), ratings)
+    db.session.commit()
+    rating_stats.backfill_stats()
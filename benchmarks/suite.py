@@ -0,0 +1,231 @@
+"""Runs the benchmark suite against a generated catalog and user base and writes the results as JSON.
+
+The app is built the way it runs in production (create_app with a catalog snapshot and a
+SQLite database, in a temporary directory) from datagen's deterministic data. Each case
+is timed per call, through the Flask test client ("http.*") or straight at the function
+("function.*"). Runs with the same arguments on the same machine are comparable, and
+--compare exits non-zero when a case's median got slower than a baseline results file
+by more than --threshold.
+
+Usage: python benchmarks/suite.py [--recipes N] [--users M] [--ratings R] [--iterations K]
+                                  [--only PREFIX] [--output results.json] [--compare baseline.json]
+e.g.   python benchmarks/suite.py --output before.json
+       python benchmarks/suite.py --compare before.json --output after.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import datagen
+
+# bcrypt's minimum cost keeps the login case about the request path rather than the hash (see bench_login.py)
+BCRYPT_ROUNDS = 4
+
+def timed(fn, iterations, warmup=10):
+    """Per-call latency statistics of fn(i) for i in range(iterations), after a few warmup calls."""
+    for i in range(min(warmup, iterations)):
+        fn(i)
+    samples = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - start)
+    samples = np.asarray(samples) * 1000
+    return {
+        'iterations': iterations,
+        'median_ms': float(np.median(samples)),
+        'p95_ms': float(np.percentile(samples, 95)),
+        'mean_ms': float(samples.mean()),
+        'min_ms': float(samples.min()),
+        'ops_per_second': float(1000 / samples.mean())
+    }
+
+def expect(response, *statuses):
+    if response.status_code not in statuses:
+        raise RuntimeError(f"{response.request.path}: HTTP {response.status_code} {response.get_data(as_text=True)[:200]}")
+    return response
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def build(tmp, args, setup):
+    """Generates the dataset into `tmp` and returns the app plus the inputs the cases draw from."""
+    start = time.perf_counter()
+    records, vocab, weights = datagen.synthetic_records(args.recipes, seed=args.seed)
+    names = [record['name'] for record in records]
+    users = datagen.synthetic_users(args.users)
+    ratings = datagen.synthetic_ratings(args.ratings, args.users, names, seed=args.seed)
+    seed_path = os.path.join(tmp, 'recipes.json')
+    datagen.write_dump(records, seed_path)
+    setup['generate_seconds'] = time.perf_counter() - start
+
+    os.environ.update({
+        'DATABASE_URL': 'sqlite:///' + os.path.join(tmp, 'bench.db'),
+        'CATALOG_SEED': seed_path,
+        'CATALOG_SNAPSHOT': os.path.join(tmp, 'catalog'),
+        'BCRYPT_LOG_ROUNDS': str(BCRYPT_ROUNDS),
+        'SUGGESTIONS_REFRESH_SECONDS': '0',
+        'RECOGNITION_BACKEND': 'stub'
+    })
+    from app import create_app, passwords
+    start = time.perf_counter()
+    app = create_app()
+    setup['create_app_seconds'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with app.app_context():
+        datagen.populate(users, ratings, passwords.hash_password(datagen.PASSWORD, rounds=BCRYPT_ROUNDS))
+    setup['populate_seconds'] = time.perf_counter() - start
+    setup['ratings'] = len(ratings)
+    return app, names, users, datagen.synthetic_pantries(vocab, weights, 200, seed=args.seed)
+
+def cases(app, names, users, pantries, rnd):
+    """name -> fn(i) for every benchmark case."""
+    from app import suggestions
+    from app.recipes import calculate_match_score
+    from app.ratings import recipe_stats, top_rated
+    from app.scoring import get_engine
+    from app.substitutions import Pantry
+    from app.models import recipe_store
+
+    client = app.test_client()
+    # Users were inserted into an empty database, so user i has id i + 1
+    user_ids = [i + 1 for i in rnd.sample(range(len(users)), min(len(users), 50))]
+    logins = [{'email': users[user_id - 1]['email'], 'password': datagen.PASSWORD} for user_id in user_ids]
+    tokens = [expect(client.post('/api/auth/login', json=login), 200).get_json()['token'] for login in logins]
+    headers = [{'Authorization': f"Bearer {token}"} for token in tokens]
+    bodies = [{'ingredients': {ing: 1 for ing in pantry}} for pantry in pantries]
+    # Ratings are looked up for recipes the way traffic arrives: mostly the popular ones
+    rated = rnd.choices(names[:1000], weights=[1 / (rank + 1) for rank in range(min(len(names), 1000))], k=200)
+    etag = expect(client.get('/api/all', headers=headers[0]), 200).headers['ETag']
+
+    with app.app_context():
+        engine = get_engine()
+        model = suggestions.get_model()
+        likes = [suggestions.user_likes(user_id) for user_id in user_ids]
+    prepared = [Pantry(pantry, engine.substitutions) for pantry in pantries]
+
+    def n(seq, i):
+        return seq[i % len(seq)]
+
+    def match_page(i):
+        rows, _, _ = engine.rank(n(prepared, i), limit=10)
+        for row in rows:
+            calculate_match_score(recipe_store.by_row(row).ingredients.keys(), n(prepared, i))
+
+    def in_context(fn):
+        def run(i):
+            with app.app_context():
+                return fn(i)
+        return run
+
+    return {
+        'http.login': lambda i: expect(client.post('/api/auth/login', json=n(logins, i)), 200),
+        'http.generate': lambda i: expect(client.post('/api/generate', json=n(bodies, i), headers=n(headers, i)), 200),
+        'http.generate_filtered': lambda i: expect(client.post('/api/generate?dietary=veg&difficulty=Easy&max_time=30',
+                                                               json=n(bodies, i), headers=n(headers, i)), 200),
+        'http.generate_quantities': lambda i: expect(client.post('/api/generate?quantities=true&servings=4',
+                                                                 json=n(bodies, i), headers=n(headers, i)), 200),
+        'http.suggestions': lambda i: expect(client.get('/api/suggestions', headers=n(headers, i)), 200),
+        'http.recipe_ratings': lambda i: expect(client.get(f"/api/recipe/{n(rated, i)}/ratings", headers=n(headers, i)), 200),
+        'http.all': lambda i: expect(client.get('/api/all', headers=n(headers, i)), 200),
+        'http.all_filtered_page': lambda i: expect(client.get('/api/all?dietary=veg&sort=cook_time&limit=50',
+                                                              headers=n(headers, i)), 200),
+        # Streamed bodies are only produced as they are read
+        'http.all_stream': lambda i: expect(client.get('/api/all?stream=ndjson', headers=n(headers, i)), 200).get_data(),
+        'http.generate_stream': lambda i: expect(client.post('/api/generate?stream=ndjson', json=n(bodies, i),
+                                                             headers=n(headers, i)), 200).get_data(),
+        'http.all_not_modified': lambda i: expect(client.get('/api/all', headers=dict(n(headers, i), **{'If-None-Match': etag})), 304),
+        'function.pantry': lambda i: Pantry(n(pantries, i), engine.substitutions),
+        'function.rank': lambda i: engine.rank(n(prepared, i), limit=10),
+        'function.rank_and_substitutions': match_page,
+        'function.suggest': lambda i: model.suggest(n(likes, i)),
+        'function.recipe_stats': in_context(lambda i: recipe_stats(n(rated, i))),
+        'function.top_rated': in_context(lambda i: top_rated())
+    }
+
+def compare(results, baseline, threshold):
+    """Prints median changes against a baseline run; returns the names of cases that regressed."""
+    regressions = []
+    for name, result in results['results'].items():
+        before = baseline.get('results', {}).get(name)
+        if before is None:
+            continue
+        ratio = result['median_ms'] / before['median_ms'] if before['median_ms'] else float('inf')
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f"  {name:<34} {before['median_ms']:9.3f} -> {result['median_ms']:9.3f} ms  ({ratio:5.2f}x){flag}",
+              file=sys.stderr)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--recipes', type=int, default=20000)
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--ratings', type=int, default=200000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--only', help='run only cases whose name starts with this prefix')
+    parser.add_argument('--output', help='write results JSON here (default: stdout)')
+    parser.add_argument('--compare', help='baseline results JSON to compare medians against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed median slowdown before a case counts as a regression')
+    args = parser.parse_args()
+
+    setup = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        app, names, users, pantries = build(tmp, args, setup)
+        results = {}
+        for name, fn in cases(app, names, users, pantries, random.Random(args.seed)).items():
+            if args.only and not name.startswith(args.only):
+                continue
+            results[name] = timed(fn, args.iterations)
+            print(f"{name:<34} median {results[name]['median_ms']:9.3f} ms   p95 {results[name]['p95_ms']:9.3f} ms",
+                  file=sys.stderr)
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'args': vars(args),
+            'setup': setup
+        },
+        'results': results
+    }
+    encoded = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(encoded + '\n')
+    else:
+        print(encoded)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"compared with {args.compare} (commit {baseline.get('meta', {}).get('commit')}):", file=sys.stderr)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}", file=sys.stderr)
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
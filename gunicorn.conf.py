@@ -0,0 +1,19 @@
+# Read by gunicorn from the working directory: gunicorn run:app
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+# One process, several threads: caches, the suggestion model and metrics are per process, so
+# more workers (WEB_CONCURRENCY) each keep their own copy; see "Concurrency" in the README
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+# create_app (catalog, scoring engine, indexes, warm-ups) runs once in the master; the forked
+# workers share what it built copy-on-write instead of each loading their own copy
+preload_app = True
+
+def pre_fork(server, worker):
+    from app import startup
+    startup.before_fork()
+
+def post_fork(server, worker):
+    from app import startup
+    startup.after_fork(server.app.wsgi())
@@ -6,7 +6,10 @@ document.addEventListener('DOMContentLoaded', () => {
         return;
     }
 
-    let allIngredients = [];
+    let searchTimer = null;
+    const RECOGNITION_POLL_MS = 1000;
+    // Same bound as the server's MAX_SERVINGS
+    const MAX_SERVINGS = 100;
     let currentUserIngredients = new Set();
     let originalRecipeData = null;
     let isGeneratedContext = false; // NEW: Tracks if the current view is from a generated search
@@ -91,32 +94,86 @@ document.addEventListener('DOMContentLoaded', () => {
         masterDetailContainer.classList.add('detail-view-open');
     }
 
+    function recipeCardHTML(r) {
+        const metaItems = [];
+        if (r.cuisine) metaItems.push(`<span>${r.cuisine}</span>`);
+        if (r.difficulty) metaItems.push(`<span><b>Difficulty:</b> ${r.difficulty}</span>`);
+        if (r.cook_time) metaItems.push(`<span><b>Cook Time:</b> ${r.cook_time} mins</span>`);
+        if (r.substitutions && Object.keys(r.substitutions).length > 0) {
+            metaItems.push(`<span class="substitution-badge">⚠️ Substitutes</span>`);
+        }
+        const subsData = r.substitutions ? JSON.stringify(r.substitutions) : '';
+        return `
+            <div class="recipe-card" data-recipe-name="${r.name}" data-substitutions='${subsData}'>
+                <img src="${r.image_url || 'https://via.placeholder.com/150'}" alt="${r.name}" class="recipe-card-image">
+                <div class="recipe-card-content">
+                    <h3>${r.name}</h3>
+                    <div class="meta">${metaItems.join(' <span class="text-muted">&bull;</span> ')}</div>
+                </div>
+            </div>`;
+    }
+
     function renderResults(recipes, title = 'Generated Recipes') {
         if (!recipes || recipes.length === 0) {
             resultsWrapper.innerHTML = `<div class="card empty-state"><p>No matching recipes found. Try different ingredients or filters!</p></div>`;
             return;
         }
-        const recipeCardsHTML = recipes.map(r => {
-            const metaItems = [];
-            if (r.cuisine) metaItems.push(`<span>${r.cuisine}</span>`);
-            if (r.difficulty) metaItems.push(`<span><b>Difficulty:</b> ${r.difficulty}</span>`);
-            if (r.cook_time) metaItems.push(`<span><b>Cook Time:</b> ${r.cook_time} mins</span>`);
-            if (r.substitutions && Object.keys(r.substitutions).length > 0) {
-                metaItems.push(`<span class="substitution-badge">⚠️ Substitutes</span>`);
-            }
-            const subsData = r.substitutions ? JSON.stringify(r.substitutions) : '';
-            return `
-                <div class="recipe-card" data-recipe-name="${r.name}" data-substitutions='${subsData}'>
-                    <img src="${r.image_url || 'https://via.placeholder.com/150'}" alt="${r.name}" class="recipe-card-image">
-                    <div class="recipe-card-content">
-                        <h3>${r.name}</h3>
-                        <div class="meta">${metaItems.join(' <span class="text-muted">&bull;</span> ')}</div>
-                    </div>
-                </div>`;
-        }).join("");
+        const recipeCardsHTML = recipes.map(recipeCardHTML).join("");
         resultsWrapper.innerHTML = `<section class="card results-container"><h2>${title}</h2><div class="recipe-list">${recipeCardsHTML}</div></section>`;
     }
 
+    // Renders an NDJSON (?stream=ndjson) response card by card as its chunks arrive
+    async function renderRecipeStream(res, title) {
+        const reader = res.body.getReader();
+        const decoder = new TextDecoder();
+        let buffered = '';
+        let list = null;
+        const append = (lines) => {
+            const recipes = lines.filter(line => line.trim()).map(line => JSON.parse(line));
+            if (recipes.length === 0) return;
+            if (!list) {
+                resultsWrapper.innerHTML = `<section class="card results-container"><h2>${title}</h2><div class="recipe-list"></div></section>`;
+                list = resultsWrapper.querySelector('.recipe-list');
+            }
+            list.insertAdjacentHTML('beforeend', recipes.map(recipeCardHTML).join(''));
+        };
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            buffered += decoder.decode(value, { stream: true });
+            const lines = buffered.split('\n');
+            buffered = lines.pop();
+            append(lines);
+        }
+        append([buffered + decoder.decode()]);
+        if (!list) renderResults([], title);
+    }
+
+    // Filtered listings stream card by card; an unfiltered one is a single document, which for
+    // /all is cached (ETag) by the server and revalidated by the browser
+    async function fetchAndShowListing(path, title, errorMessage) {
+        const params = filterParams();
+        const streamed = params.toString() !== '';
+        if (streamed) params.append('stream', 'ndjson');
+        const res = await fetchWithAuth(streamed ? `${path}?${params.toString()}` : path);
+        if (!res.ok) throw new Error(errorMessage);
+        if (streamed) {
+            await renderRecipeStream(res, title);
+        } else {
+            const data = await res.json();
+            renderResults(data.recipes, title);
+        }
+    }
+
+    // The filter panel as query parameters; /generate, /all and /favorites all understand them
+    function filterParams() {
+        const params = new URLSearchParams();
+        if (dietaryFilter.value !== 'all') params.append('dietary', dietaryFilter.value);
+        if (difficultyFilter.value !== 'all') params.append('difficulty', difficultyFilter.value);
+        if (timeFilter.value) params.append('max_time', timeFilter.value);
+        return params;
+    }
+
     function renderRecipeDetail(recipe, substitutions) {
         originalRecipeData = { ...recipe };
 
@@ -152,7 +209,7 @@ document.addEventListener('DOMContentLoaded', () => {
                     subNote = ` <span class="substitution-note">(for ${formattedOriginal})</span>`;
                 }
             }
-            return `<li data-original-amount="${amount}">${formattedName}${subNote} <span>${Math.round(amount)}g</span></li>`;
+            return `<li data-original-amount="${amount}" data-ingredient="${name}">${formattedName}${subNote} <span>${Math.round(amount)}g</span></li>`;
         }).join('');
 
         // UPDATED: This whole block is now conditional
@@ -174,11 +231,7 @@ document.addEventListener('DOMContentLoaded', () => {
             }
         }
 
-        const nutritionHTML = recipe.nutrition ? Object.entries(recipe.nutrition).map(([key, value]) => {
-            const unit = key.toLowerCase() === 'calories' ? '' : 'g';
-            const formattedKey = key.charAt(0).toUpperCase() + key.slice(1);
-            return `<li><strong>${formattedKey}</strong> ${value}${unit}</li>`;
-        }).join('') : '<li>Not available</li>';
+        const nutritionHTML = formatNutrition(recipe.nutrition);
 
         const stepsHTML = recipe.steps.map(step => `<li>${step}</li>`).join('');
 
@@ -214,23 +267,35 @@ document.addEventListener('DOMContentLoaded', () => {
         detailView.querySelector('.star-rating').addEventListener('click', handleStarClick);
     }
 
+    function formatNutrition(nutrition) {
+        return nutrition ? Object.entries(nutrition).map(([key, value]) => {
+            const unit = key.toLowerCase() === 'calories' ? '' : 'g';
+            const formattedKey = key.charAt(0).toUpperCase() + key.slice(1);
+            return `<li><strong>${formattedKey}</strong> ${value}${unit}</li>`;
+        }).join('') : '<li>Not available</li>';
+    }
+
     // --- FEATURE LOGIC ---
-    function updateServings(change) {
+    async function updateServings(change) {
         const display = document.getElementById('servings-display');
         let currentServings = parseInt(display.textContent);
-        const newServings = Math.max(1, currentServings + change);
+        const newServings = Math.min(MAX_SERVINGS, Math.max(1, currentServings + change));
         if (newServings === currentServings) return;
         display.textContent = newServings;
 
-        const originalServings = originalRecipeData.servings;
-        const ingredientsList = detailView.querySelector('.ingredients-list');
-
-        ingredientsList.querySelectorAll('li[data-original-amount]').forEach(li => {
-            const originalAmount = parseFloat(li.dataset.originalAmount);
-            const amountPerServing = originalAmount / originalServings;
-            const newAmount = Math.round(amountPerServing * newServings);
-            li.querySelector('span').textContent = `${newAmount}g`;
-        });
+        // The server scales ingredient amounts; nutrition is per serving and stays as shown
+        try {
+            const res = await fetchWithAuth(`/recipe/${encodeURIComponent(originalRecipeData.name)}?servings=${newServings}`);
+            if (!res.ok) throw new Error('Could not scale the recipe');
+            const scaled = await res.json();
+            if (display.textContent !== String(newServings)) return;
+            detailView.querySelectorAll('.ingredients-list li[data-ingredient]').forEach(li => {
+                const amount = scaled.ingredients[li.dataset.ingredient];
+                if (amount !== undefined) li.querySelector('span').textContent = `${Math.round(amount)}g`;
+            });
+        } catch (error) {
+            showToast(error.message, 'error');
+        }
     }
 
     async function fetchAndDisplayRatings(recipeName) {
@@ -311,10 +376,7 @@ document.addEventListener('DOMContentLoaded', () => {
         resultsWrapper.innerHTML = `<div class="card"><div class="spinner" style="display:block; margin: 80px auto; width: 40px; height: 40px;"></div></div>`;
         showListView();
         try {
-            const res = await fetchWithAuth('/all');
-            if (!res.ok) throw new Error('Could not fetch recipes.');
-            const data = await res.json();
-            renderResults(data.recipes, 'Discover Recipes');
+            await fetchAndShowListing('/all', 'Discover Recipes', 'Could not fetch recipes.');
         } catch (error) {
             showToast(error.message, 'error');
             resultsWrapper.innerHTML = '';
@@ -327,10 +389,7 @@ document.addEventListener('DOMContentLoaded', () => {
         resultsWrapper.innerHTML = `<div class="card"><div class="spinner" style="display:block; margin: 80px auto; width: 40px; height: 40px;"></div></div>`;
         showListView();
         try {
-            const res = await fetchWithAuth('/favorites');
-            if (!res.ok) throw new Error('Could not fetch your favorites.');
-            const data = await res.json();
-            renderResults(data.recipes, 'Your Favorite Recipes');
+            await fetchAndShowListing('/favorites', 'Your Favorite Recipes', 'Could not fetch your favorites.');
         } catch (error) {
             showToast(error.message, 'error');
             resultsWrapper.innerHTML = '';
@@ -370,38 +429,51 @@ document.addEventListener('DOMContentLoaded', () => {
         toggleButtonLoading(generateBtn, true);
         resultsWrapper.innerHTML = `<div class="card"><div class="spinner" style="display:block; margin: 80px auto; width: 40px; height: 40px;"></div></div>`;
 
-        const dietary = dietaryFilter.value;
-        const difficulty = difficultyFilter.value;
-        const maxTime = timeFilter.value;
+        const params = filterParams();
 
-        const params = new URLSearchParams();
-        if (dietary !== 'all') params.append('dietary', dietary);
-        if (difficulty !== 'all') params.append('difficulty', difficulty);
-        if (maxTime) params.append('max_time', maxTime);
-        const queryString = params.toString() ? `?${params.toString()}` : '';
+        // The server maps each name to the catalog's spelling, so "Tomatoes" is as good as "tomato"
+        const entries = Array.from(ingredientRows)
+            .map(row => ({ input: row.querySelector(".ingredient-input"), quantityInput: row.querySelector(".quantity-input") }))
+            .filter(entry => entry.input.value.trim());
+        let resolved = {};
+        try {
+            const res = await fetchWithAuth('/ingredients/resolve', {
+                method: 'POST',
+                body: JSON.stringify({ ingredients: entries.map(entry => entry.input.value.trim()) }),
+            });
+            const data = await res.json();
+            if (!res.ok) throw new Error(data.message || 'Could not check ingredients');
+            resolved = data.ingredients;
+        } catch (error) {
+            showToast(error.message, 'error');
+            toggleButtonLoading(generateBtn, false);
+            resultsWrapper.innerHTML = '';
+            return;
+        }
 
         const ingredients = {};
         const addedIngredients = new Set();
         let hasError = false;
+        let hasQuantities = false;
 
-        ingredientRows.forEach(row => {
+        entries.forEach(({ input, quantityInput }) => {
             if (hasError) return;
-            const input = row.querySelector(".ingredient-input");
-            const ing = input.value.trim().toLowerCase();
-            if (ing) {
-                if (!allIngredients.map(i => i.toLowerCase()).includes(ing)) {
-                    showToast(`'${input.value}' is not a valid ingredient.`, "error");
-                    hasError = true;
-                    return;
-                }
-                if (addedIngredients.has(ing)) {
-                    showToast(`'${input.value}' has been added more than once.`, "error");
-                    hasError = true;
-                    return;
-                }
-                ingredients[ing] = 1;
-                addedIngredients.add(ing);
+            const ing = resolved[input.value.trim()];
+            if (!ing) {
+                showToast(`'${input.value}' is not a valid ingredient.`, "error");
+                hasError = true;
+                return;
+            }
+            if (addedIngredients.has(ing)) {
+                showToast(`'${input.value}' has been added more than once.`, "error");
+                hasError = true;
+                return;
             }
+            // Rows without a quantity count as "enough"
+            const quantity = parseFloat(quantityInput.value);
+            ingredients[ing] = quantity > 0 ? quantity : null;
+            if (quantity > 0) hasQuantities = true;
+            addedIngredients.add(ing);
         });
 
         if (hasError || Object.keys(ingredients).length === 0) {
@@ -412,6 +484,8 @@ document.addEventListener('DOMContentLoaded', () => {
         }
 
         currentUserIngredients = new Set(Object.keys(ingredients));
+        if (hasQuantities) params.append('quantities', 'true');
+        const queryString = params.toString() ? `?${params.toString()}` : '';
 
         try {
             const res = await fetchWithAuth(`/generate${queryString}`, {
@@ -502,6 +576,24 @@ document.addEventListener('DOMContentLoaded', () => {
     });
 
     addIngredientBtn.addEventListener("click", () => addIngredientRow());
+    // Completions come from the server-side index as the user types
+    ingredientList.addEventListener("input", (e) => {
+        if (!e.target.classList.contains('ingredient-input')) return;
+        const query = e.target.value.trim();
+        clearTimeout(searchTimer);
+        if (!query) return;
+        searchTimer = setTimeout(async () => {
+            try {
+                const res = await fetchWithAuth(`/ingredients/search?q=${encodeURIComponent(query)}&limit=10`);
+                if (!res.ok) return;
+                const data = await res.json();
+                ingredientDatalist.innerHTML = data.ingredients
+                    .map(i => `<option value="${i.charAt(0).toUpperCase() + i.slice(1)}"></option>`).join('');
+            } catch (error) {
+                // Keep the previous completions
+            }
+        }, 150);
+    });
     ingredientForm.addEventListener("submit", (e) => {
         e.preventDefault();
         generateAndFilterRecipes();
@@ -527,11 +619,17 @@ document.addEventListener('DOMContentLoaded', () => {
             const formData = new FormData();
             formData.append('image', file);
             try {
-                const res = await fetchWithAuth('/recognize-ingredients', {
+                let res = await fetchWithAuth('/recognize-ingredients', {
                     method: 'POST',
                     body: formData
                 });
-                const data = await res.json();
+                let data = await res.json();
+                // 202: the image is still being recognized; poll its job until it settles
+                while (res.status === 202) {
+                    await new Promise(resolve => setTimeout(resolve, RECOGNITION_POLL_MS));
+                    res = await fetchWithAuth(`/recognize-ingredients/jobs/${data.job_id}`);
+                    data = await res.json();
+                }
                 if (!res.ok) throw new Error(data.message || 'Recognition failed');
                 data.recognized_ingredients.forEach(addRecognizedIngredient);
                 showToast('Ingredients added from image!', 'success');
@@ -554,19 +652,6 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
-    // --- FINAL INITIALIZATION ---
-    async function initializeApp() {
-        try {
-            const res = await fetchWithAuth('/ingredients');
-            if (!res.ok) throw new Error('Could not fetch ingredients');
-            const data = await res.json();
-            allIngredients = data.ingredients.map(i => i.charAt(0).toUpperCase() + i.slice(1));
-            ingredientDatalist.innerHTML = allIngredients.map(ing => `<option value="${ing}"></option>`).join('');
-        } catch (error) {
-            showToast('Could not connect to the server.', 'error');
-        }
-    }
-
     function showToast(message, type = 'error') {
         const c = document.getElementById('toastContainer');
         const t = document.createElement('div');
@@ -583,6 +668,5 @@ document.addEventListener('DOMContentLoaded', () => {
         if (s) s.style.display = isLoading ? 'block' : 'none';
         if (t) t.style.display = isLoading ? 'none' : 'inline';
     }
-    initializeApp();
 });
 
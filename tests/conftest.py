@@ -0,0 +1,33 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    # A fresh database and catalog snapshot per test; cheap hashing and no network
+    monkeypatch.setenv('DATABASE_URL', 'sqlite:///' + str(tmp_path / 'test.db'))
+    monkeypatch.setenv('CATALOG_SNAPSHOT', str(tmp_path / 'catalog'))
+    monkeypatch.setenv('RECOGNITION_BACKEND', 'stub')
+    monkeypatch.setenv('BCRYPT_LOG_ROUNDS', '4')
+    monkeypatch.setenv('SUGGESTIONS_REFRESH_SECONDS', '0')
+    monkeypatch.setenv('WARMUP', '')
+    from app import create_app, db
+    app = create_app()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def register(client, email='cook@example.com', password='correct horse'):
+    client.post('/api/auth/register', json={'name': 'cook', 'email': email, 'password': password})
+    token = client.post('/api/auth/login', json={'email': email, 'password': password}).get_json()['token']
+    return {'Authorization': f"Bearer {token}"}
+
+@pytest.fixture
+def auth(client):
+    return register(client)
@@ -0,0 +1,16 @@
+"""Tokens stop working once the password they were issued under changes."""
+from app import passwords
+from app.models import UserProfile, db
+from conftest import register
+
+def test_password_change_revokes_earlier_tokens(app, client):
+    old = register(client)
+    assert client.get('/api/ingredients', headers=old).status_code == 200
+    with app.app_context():
+        user = UserProfile.query.filter_by(email='cook@example.com').first()
+        user.password_hash = passwords.hash_password('battery staple')
+        db.session.commit()
+    assert client.get('/api/ingredients', headers=old).status_code == 401
+    login = client.post('/api/auth/login', json={'email': 'cook@example.com', 'password': 'battery staple'})
+    new = {'Authorization': f"Bearer {login.get_json()['token']}"}
+    assert client.get('/api/ingredients', headers=new).status_code == 200
@@ -0,0 +1,44 @@
+"""Recipe dumps are validated before anything is built from them, and imported catalogs are kept."""
+import json
+import pytest
+from app.catalog import read_recipe_dump
+
+def write_json(tmp_path, recipes):
+    path = tmp_path / 'recipes.json'
+    path.write_text(json.dumps(recipes), encoding='utf-8')
+    return str(path)
+
+def test_numbers_are_normalized(tmp_path):
+    path = tmp_path / 'recipes.csv'
+    path.write_text('name,ingredients,nutrition\nToast,bread:2;butter:10.5,calories:350\n', encoding='utf-8')
+    record = read_recipe_dump(str(path))[0]
+    assert record['ingredients'] == {'bread': 2, 'butter': 10.5}
+    assert record['nutrition'] == {'calories': 350}
+
+@pytest.mark.parametrize('field, values', [
+    ('nutrition', {'calories': '350 kcal'}),
+    ('nutrition', {'calories': True}),
+    ('nutrition', {'calories': None}),
+    ('ingredients', {'bread': 'two'})
+])
+def test_non_numeric_values_name_the_recipe_and_field(tmp_path, field, values):
+    recipe = {'name': 'Toast', 'ingredients': {'bread': 2}, field: values}
+    with pytest.raises(ValueError) as error:
+        read_recipe_dump(write_json(tmp_path, [recipe]))
+    assert '(Toast)' in str(error.value) and f"{field}[" in str(error.value)
+
+def test_csv_errors_point_at_the_line(tmp_path):
+    path = tmp_path / 'recipes.csv'
+    path.write_text('name,ingredients,nutrition\nToast,bread:2,calories:lots\n', encoding='utf-8')
+    with pytest.raises(ValueError, match=r"recipes\.csv:2 \(Toast\): nutrition\['calories'\]"):
+        read_recipe_dump(str(path))
+
+def test_imports_survive_a_restart_whatever_the_last_path(app, tmp_path):
+    from app import create_app, models
+    seed = app.config['CATALOG_SEED']
+    with open(seed, encoding='utf-8') as f:
+        extra = dict(json.load(f)[0], name='Imported Soup')
+    result = app.test_cli_runner().invoke(args=['catalog', 'import', write_json(tmp_path, [extra]), seed])
+    assert result.exit_code == 0, result.output
+    create_app()
+    assert 'Imported Soup' in models.recipe_store
@@ -0,0 +1,11 @@
+"""Encoded catalog documents: detail documents are bounded and still revalidate by ETag."""
+from app import payloads
+
+def test_detail_documents_are_bounded(client, auth, monkeypatch):
+    monkeypatch.setattr(payloads, 'DETAIL_CACHE_SIZE', 1)
+    monkeypatch.setitem(payloads._cache, 'version', None)
+    first = client.get('/api/recipe/Avocado Toast', headers=auth)
+    client.get('/api/recipe/Pad Thai', headers=auth)
+    assert payloads._cache['details'].size() == 1
+    again = client.get('/api/recipe/Avocado Toast', headers=dict(auth, **{'If-None-Match': first.headers['ETag']}))
+    assert again.status_code == 304
@@ -0,0 +1,36 @@
+"""Ratings are whole stars from 1 to 5, and the cached leaderboard only changes when one commits."""
+import pytest
+
+@pytest.mark.parametrize('rating', [4.7, True, '4', 0, 6, None])
+def test_invalid_ratings_are_rejected(client, auth, rating):
+    response = client.post('/api/rate', json={'recipe_name': 'Avocado Toast', 'rating': rating}, headers=auth)
+    assert response.status_code == 400
+    batch = client.post('/api/rate/batch', json={'ratings': [{'recipe_name': 'Avocado Toast', 'rating': 5},
+                                                             {'recipe_name': 'Pad Thai', 'rating': rating}]},
+                        headers=auth)
+    assert batch.status_code == 400 and batch.get_json()['index'] == 1
+    assert client.get('/api/recipe/Avocado Toast/ratings', headers=auth).get_json()['rating_count'] == 0
+
+@pytest.mark.parametrize('rating', [4, 4.0])
+def test_whole_star_ratings_are_stored(client, auth, rating):
+    response = client.post('/api/rate', json={'recipe_name': 'Avocado Toast', 'rating': rating}, headers=auth)
+    assert response.status_code == 200
+    assert client.get('/api/recipe/Avocado Toast/ratings', headers=auth).get_json()['user_rating'] == 4
+
+def test_leaderboard_changes_on_commit_only(app, client, auth):
+    from app import db, ratings
+    from app.models import RecipeRating
+    client.post('/api/rate', json={'recipe_name': 'Pad Thai', 'rating': 5}, headers=auth)
+    with app.app_context():
+        assert ratings.top_rated() == ['Pad Thai']
+
+        # A flushed but rolled-back rating leaves the cached leaderboard alone
+        db.session.add(RecipeRating(user_id=1, recipe_name='Fish Tacos', rating=5))
+        db.session.flush()
+        assert ratings.top_rated() == ['Pad Thai']
+        db.session.rollback()
+        assert ratings.top_rated() == ['Pad Thai']
+
+    client.post('/api/rate', json={'recipe_name': 'Fish Tacos', 'rating': 5}, headers=auth)
+    with app.app_context():
+        assert ratings.top_rated() == ['Fish Tacos', 'Pad Thai']
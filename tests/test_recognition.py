@@ -0,0 +1,64 @@
+"""Recognition jobs: submitting never waits on the backend, and any recognizer sharing the store can answer a poll."""
+import threading
+from app.recognition import Recognizer, StubBackend
+from app.results import LocalBackend
+
+class GatedBackend(StubBackend):
+    """Stub backend that holds every call until the test opens the gate."""
+
+    def __init__(self):
+        super().__init__()
+        self.gate = threading.Event()
+
+    def concepts(self, image_bytes):
+        self.gate.wait(5)
+        return super().concepts(image_bytes)
+
+def wait(recognizer, job_id):
+    recognizer._jobs[job_id][0].result(timeout=5)
+    return recognizer.job(job_id)
+
+def test_submit_returns_before_the_backend_answers():
+    backend = GatedBackend()
+    recognizer = Recognizer(backend, prepare=lambda image_bytes: image_bytes)
+    job_id = recognizer.submit(b'garlic\nonion')
+    assert recognizer.job(job_id)['status'] == 'pending'
+    backend.gate.set()
+    assert wait(recognizer, job_id) == {'status': 'done', 'concepts': [('garlic', 1.0), ('onion', 1.0)]}
+
+def test_identical_images_share_one_job():
+    backend = GatedBackend()
+    recognizer = Recognizer(backend, prepare=lambda image_bytes: image_bytes)
+    assert recognizer.submit(b'basil') == recognizer.submit(b'basil')
+    backend.gate.set()
+    wait(recognizer, recognizer.submit(b'basil'))
+    assert backend.calls == 1
+
+def test_shared_store_answers_other_workers():
+    shared = LocalBackend()
+    backend = GatedBackend()
+    worker = Recognizer(backend, prepare=lambda image_bytes: image_bytes, shared=shared)
+    other = Recognizer(StubBackend(), shared=shared)
+    job_id = worker.submit(b'basil')
+    assert other.job(job_id)['status'] == 'pending'
+    backend.gate.set()
+    wait(worker, job_id)
+    assert other.job(job_id) == {'status': 'done', 'concepts': [['basil', 1.0]]}
+    assert other.job('0' * 64) is None
+
+def test_failures_are_reported_without_raising():
+    class FailingBackend(StubBackend):
+        def concepts(self, image_bytes):
+            raise RuntimeError('upstream down')
+
+    recognizer = Recognizer(FailingBackend(), prepare=lambda image_bytes: image_bytes, shared=LocalBackend())
+    job_id = recognizer.submit(b'x')
+    recognizer._jobs[job_id][0].exception(timeout=5)
+    assert recognizer.job(job_id) == {'status': 'failed', 'message': 'Image recognition failed.', 'code': 500}
+
+def test_oversized_bodies_are_not_called_images(app, client, auth):
+    app.config['MAX_CONTENT_LENGTH'] = 1024
+    ratings = [{'recipe_name': 'Avocado Toast', 'rating': 5}] * 100
+    response = client.post('/api/rate/batch', json={'ratings': ratings}, headers=auth)
+    assert response.status_code == 413
+    assert response.get_json() == {'message': 'Request body too large.'}
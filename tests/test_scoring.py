@@ -0,0 +1,73 @@
+"""ScoringEngine must agree with calculate_match_score, the per-recipe reference it batches."""
+import random
+import numpy as np
+import pytest
+from app import models
+from app.catalog import read_recipe_dump, RECORD_FIELDS
+from app.models import Recipe, SUBSTITUTION_MAP
+from app.recipes import calculate_match_score
+from app.scoring import ScoringEngine, MIN_SCORE
+from app.substitutions import SubstitutionGraph, Pantry, edges
+
+def seed_catalog():
+    recipes = [Recipe(*(record[field] for field in RECORD_FIELDS)) for record in read_recipe_dump(models.SEED_PATH)]
+    vocab = sorted({ing for recipe in recipes for ing in recipe.ingredients})
+    return recipes, vocab, SubstitutionGraph(SUBSTITUTION_MAP)
+
+def synthetic_catalog(n=400, seed=3):
+    rnd = random.Random(seed)
+    # Substitution table names plus spelling variants the canonical form has to fold together
+    vocab = sorted({name for required, sub, _ in edges(SUBSTITUTION_MAP) for name in (required, sub)})
+    vocab += ['eggs', 'Egg', 'tomatoes', 'black beans', 'Garlic'] + [f"ingredient {i}" for i in range(40)]
+    table = {required: list(subs) for required, subs in SUBSTITUTION_MAP.items()}
+    for _ in range(60):
+        required, sub = rnd.sample(vocab, 2)
+        table.setdefault(required, []).append((sub, round(rnd.uniform(0.3, 0.95), 2)))
+    recipes = [Recipe(f"recipe {i}", {ing: rnd.choice([1, 50, 200]) for ing in rnd.sample(vocab, rnd.randint(2, 9))},
+                      [], {"calories": 100}, rnd.choice(["Easy", "Hard"]), rnd.choice([10, 30, 60]), "Universal",
+                      "", [], rnd.sample(["veg", "gluten-free"], rnd.randint(0, 2)), rnd.randint(1, 4))
+               for i in range(n)]
+    return recipes, vocab, SubstitutionGraph(table, max_hops=2)
+
+def pantries(vocab, n=40, seed=11):
+    rnd = random.Random(seed)
+    return [rnd.sample(vocab, rnd.randint(1, min(10, len(vocab)))) for _ in range(n)]
+
+@pytest.fixture(params=['seed', 'synthetic'])
+def catalog(request):
+    recipes, vocab, graph = seed_catalog() if request.param == 'seed' else synthetic_catalog()
+    return recipes, vocab, graph, ScoringEngine(recipes, graph)
+
+def reference_scores(recipes, pantry):
+    return np.array([calculate_match_score(recipe.ingredients.keys(), pantry)[0] for recipe in recipes])
+
+def test_score_matches_reference(catalog):
+    recipes, vocab, graph, engine = catalog
+    for names in pantries(vocab):
+        pantry = Pantry(names, graph)
+        # Confidences are summed in a different order, so allow for rounding
+        np.testing.assert_allclose(engine.score(pantry), reference_scores(recipes, pantry), rtol=0, atol=1e-9)
+
+def test_unknown_quantities_score_like_plain_matching(catalog):
+    recipes, vocab, graph, engine = catalog
+    for names in pantries(vocab, n=10):
+        pantry = Pantry({name: None for name in names}, graph)
+        np.testing.assert_allclose(engine.score(pantry, quantities=True, servings=3), engine.score(pantry),
+                                   rtol=0, atol=1e-12)
+
+@pytest.mark.parametrize('offset,limit', [(0, 10), (5, 7), (0, 1000)])
+def test_rank_matches_reference_order(catalog, offset, limit):
+    recipes, vocab, graph, engine = catalog
+    mask = engine.filter_mask(dietary='veg')
+    for names in pantries(vocab, n=15):
+        pantry = Pantry(names, graph)
+        expected = reference_scores(recipes, pantry)
+        for candidates in (None, mask):
+            rows, scores, total = engine.rank(pantry, candidates, limit=limit, offset=offset)
+            allowed = expected if candidates is None else np.where(candidates, expected, 0)
+            hits = np.flatnonzero(allowed > MIN_SCORE)
+            assert total == len(hits)
+            # Best first, ties in catalog order
+            ordered = hits[np.argsort(-np.round(allowed[hits], 9), kind='stable')]
+            assert rows.tolist() == ordered[offset:offset + limit].tolist()
+            np.testing.assert_allclose(scores, allowed[rows], rtol=0, atol=1e-9)
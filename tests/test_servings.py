@@ -0,0 +1,21 @@
+"""Scaling a recipe to a serving count scales its ingredient amounts; nutrition stays per serving."""
+
+def test_scaling_leaves_per_serving_nutrition_alone(client, auth):
+    plain = client.get('/api/recipe/Avocado Toast', headers=auth).get_json()
+    scaled = client.get('/api/recipe/Avocado Toast?servings=4', headers=auth).get_json()
+    assert plain['servings'] == 1
+    assert scaled['servings'] == 4
+    assert scaled['ingredients'] == {name: amount * 4 for name, amount in plain['ingredients'].items()}
+    assert scaled['nutrition'] == plain['nutrition'] == {'calories': 350, 'protein': 12, 'carbs': 30, 'fat': 20}
+
+def test_scaled_generate_results_keep_nutrition_out(client, auth):
+    response = client.post('/api/generate?servings=2', json={'ingredients': {'avocado': 1, 'bread': 1}}, headers=auth)
+    recipes = response.get_json()['recipes']
+    assert recipes and all(recipe['servings'] == 2 and 'nutrition' not in recipe for recipe in recipes)
+
+def test_servings_outside_the_supported_range_are_rejected(client, auth):
+    for servings in ('0', '101', 'four'):
+        assert client.get(f'/api/recipe/Avocado Toast?servings={servings}', headers=auth).status_code == 400
+        response = client.post(f'/api/generate?servings={servings}', json={'ingredients': {'bread': 1}}, headers=auth)
+        assert response.status_code == 400
+    assert client.get('/api/recipe/Avocado Toast?servings=100', headers=auth).get_json()['servings'] == 100